@@ -0,0 +1,75 @@
+"""
+    Command-line maintenance tasks.
+    Run from the app directory, ex. `python cli.py recount-comments`.
+"""
+from argparse import ArgumentParser, Namespace
+from core.config import CONFIG, SessionLocal
+from core.storage import LOCAL_STORAGE
+from core.utils import create_elastic_search
+import core.indexer as Indexer
+import crud.comment as CommentCrud
+import crud.file as FileCrud
+import crud.site as SiteCrud # Also invalidates cached site config outputs on changes
+
+# Importing models will have SQLAlchemy resolve their relationships
+from models.user import *
+from models.category import *
+from models.article import *
+from models.comment import *
+from models.file import *
+from models.site import *
+from models.search import *
+
+def recount_comments(args: Namespace):
+    """
+    Recalculates the comment counters of all articles.
+    """
+    db = SessionLocal()
+    try:
+        CommentCrud.recount_comments(db)
+        SiteCrud.invalidate_configuration_output(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Recalculated comment counters")
+
+def migrate_files(args: Namespace):
+    """
+    Moves the contents of files stored in the DB to the local file storage.
+    """
+    db = SessionLocal()
+    try:
+        amount = FileCrud.migrate_to_storage(db, LOCAL_STORAGE)
+    finally:
+        db.close()
+    print(f"Moved {amount} files to {LOCAL_STORAGE.root}")
+
+def reindex_search(args: Namespace):
+    """
+    Rebuilds the articles search index from the DB.
+    """
+    if not getattr(CONFIG, "ES_ENABLED", None):
+        print("ElasticSearch is not enabled")
+        return
+    db = SessionLocal()
+    es = create_elastic_search()
+    try:
+        result = Indexer.reindex_articles(db, es)
+    finally:
+        es.close()
+        db.close()
+    print(f"Indexed {result.indexed_articles} articles into {result.index} in {result.seconds:.1f}s ({result.articles_per_second:.1f} articles/s)")
+
+def main():
+    parser = ArgumentParser(description="Bloggy maintenance commands.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("recount-comments", help="Recalculates the comment counters of all articles.").set_defaults(func=recount_comments)
+    subparsers.add_parser("migrate-files", help="Moves file contents stored in the DB to the local file storage.").set_defaults(func=migrate_files)
+    subparsers.add_parser("reindex-search", help="Rebuilds the articles search index from the DB.").set_defaults(func=reindex_search)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
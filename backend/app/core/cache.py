@@ -0,0 +1,59 @@
+"""
+    In-memory caches.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import threading
+import time
+
+class LRUCache:
+    """
+    Thread-safe mapping with a max amount of entries, evicting the least recently used ones.
+    Entries may also expire after a time.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict() # Values and their expiration times
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        """Returns a cached value, or default if it's not cached or has expired."""
+        with self.lock:
+            if key not in self.entries:
+                return default
+            value, expiration_time = self.entries[key]
+            if expiration_time != None and expiration_time <= time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl: float=None):
+        """
+        Caches a value, evicting the least recently used one if the cache is full.
+        ttl is the seconds after which the value expires; if None, it only leaves the cache when evicted.
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl if ttl != None else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        """Removes a value from the cache, if present."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Any], bool]):
+        """Removes the values that match a predicate."""
+        with self.lock:
+            for key in [key for key, (value, _) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+    def clear(self):
+        """Removes all values."""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
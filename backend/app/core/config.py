@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 from dataclasses import dataclass, fields
 import os
 
@@ -35,8 +37,51 @@ class AppConfig():
     API_DOCS: bool = False
     """Toggles Swagger UI at /docs"""
 
+    DB_ASYNC_POOL_SIZE: int = 10
+    """Connections kept open by the async DB engine; 0 disables pooling."""
+
+    # Auth settings
+    AUTH_CACHE_TTL: int = 30
+    """Seconds that verified tokens are cached for; bounds how long tokens invalidated by another process stay usable."""
+    AUTH_CACHE_SIZE: int = 1024
+    """Max verified tokens cached."""
+    BCRYPT_ROUNDS: int = 12
+    """Cost factor of password hashes; existing hashes are rehashed with it when their users log in."""
+    PASSWORD_HASHING_WORKERS: int = 2
+    """Threads that hash and verify passwords."""
+    PASSWORD_HASHING_QUEUE_SIZE: int = 16
+    """Max password operations waiting for a hashing thread; further ones are rejected until the queue drains."""
+
+    # ElasticSearch connection settings
+    ES_CONNECTIONS: int = 10
+    """Max connections kept open to each ElasticSearch node."""
+    ES_TIMEOUT: int = 10
+    """Timeout for ElasticSearch requests, in seconds."""
+    ES_MAX_RETRIES: int = 3
+    """Times that failed or timed out ElasticSearch requests are retried."""
+    SEARCH_INDEX_BATCH_SIZE: int = 200
+    """Max articles whose search documents are updated per bulk request."""
+    SEARCH_INDEX_MAX_BACKOFF: int = 300
+    """Max seconds to wait before retrying failed search document updates."""
+    SEARCH_REINDEX_WORKERS: int = 4
+    """Threads that send bulk requests when rebuilding the search index."""
+
+    # File storage settings
+    FILE_STORAGE: str = "database"
+    """Where uploaded file contents are stored; either "database" or "local"."""
+    FILE_STORAGE_PATH: str = "/data/files"
+    """Root directory of the local file store."""
+
+    # Image derivative settings
+    IMAGE_CACHE_PATH: str = "/data/image_cache"
+    """Directory for cached resized images."""
+    IMAGE_CACHE_SIZE: int = 512
+    """Max size of the resized image cache, in megabytes."""
+    IMAGE_WORKERS: int = 2
+    """Amount of processes that resize images."""
+
     def __init__(self):
-        OPTIONAL_ENV_VARS = {"GOOGLE_CLIENT_URL", "ES_ENABLED", "ES_URL", "ES_USERNAME", "ES_PASSWORD", "API_DOCS"}
+        OPTIONAL_ENV_VARS = {"GOOGLE_CLIENT_URL", "DB_ASYNC_POOL_SIZE", "AUTH_CACHE_TTL", "AUTH_CACHE_SIZE", "BCRYPT_ROUNDS", "PASSWORD_HASHING_WORKERS", "PASSWORD_HASHING_QUEUE_SIZE", "ES_ENABLED", "ES_URL", "ES_USERNAME", "ES_PASSWORD", "ES_CONNECTIONS", "ES_TIMEOUT", "ES_MAX_RETRIES", "SEARCH_INDEX_BATCH_SIZE", "SEARCH_INDEX_MAX_BACKOFF", "SEARCH_REINDEX_WORKERS", "API_DOCS", "FILE_STORAGE", "FILE_STORAGE_PATH", "IMAGE_CACHE_PATH", "IMAGE_CACHE_SIZE", "IMAGE_WORKERS"}
 
         for field in fields(AppConfig): # Assign fields
             value = os.getenv(field.name)
@@ -64,11 +109,17 @@ SOCIAL_NETWORKS: dict[str, str] = {
 }
 
 URL_DATABASE = f"postgresql://{CONFIG.DB_USERNAME}:{CONFIG.DB_PASSWORD}@{CONFIG.DB_ADDRESS}/{CONFIG.DB_NAME}"
+URL_DATABASE_ASYNC = f"postgresql+asyncpg://{CONFIG.DB_USERNAME}:{CONFIG.DB_PASSWORD}@{CONFIG.DB_ADDRESS}/{CONFIG.DB_NAME}"
 
 engine = create_engine(URL_DATABASE)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine for routes that don't block the event loop while querying
+async_engine = create_async_engine(URL_DATABASE_ASYNC, poolclass=NullPool) if CONFIG.DB_ASYNC_POOL_SIZE == 0 else create_async_engine(URL_DATABASE_ASYNC, pool_size=CONFIG.DB_ASYNC_POOL_SIZE)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency to get the database session
@@ -78,3 +129,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
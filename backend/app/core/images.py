@@ -0,0 +1,188 @@
+"""
+    Resized and re-encoded derivatives of uploaded images.
+    Derivatives are rendered in a process pool and cached on disk.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from core.config import CONFIG
+import tempfile
+import threading
+import shutil
+import io
+import os
+
+try:
+    from PIL import Image
+except ImportError: # Image processing is optional
+    Image = None
+
+MAX_DIMENSION = 4096 # Max width and height of derivatives, in pixels.
+FORMATS = { # Maps supported derivative formats to their MIME type.
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+DEFAULT_FORMAT = "png" # Used for derivatives of images whose format is not in FORMATS, if none is requested.
+
+def is_available() -> bool:
+    """
+    Returns whether image processing is available.
+    """
+    return Image != None
+
+def get_default_format(mime_type: str) -> str:
+    """
+    Returns the format to encode derivatives of an image in, if none is requested.
+    """
+    for format, format_mime_type in FORMATS.items():
+        if format_mime_type == mime_type:
+            return format
+    return DEFAULT_FORMAT
+
+def get_derivative_key(width: int | None, height: int | None, format: str) -> str:
+    """
+    Returns the name of a derivative within the derivatives of an image.
+    """
+    return f"{width or 0}x{height or 0}.{format}"
+
+def render_derivative(content: bytes, width: int | None, height: int | None, format: str) -> bytes:
+    """
+    Resizes an image to fit within the dimensions, keeping its aspect ratio, and encodes it in a format.
+    Images are never upscaled. Runs in the worker processes.
+    """
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.thumbnail((width or MAX_DIMENSION, height or MAX_DIMENSION))
+            if format == "jpeg" and image.mode not in ("RGB", "L"): # JPEG has no transparency
+                image = image.convert("RGB")
+            output = io.BytesIO()
+            image.save(output, format=format.upper())
+            return output.getvalue()
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError("File is not a valid image")
+
+class DerivativeCache:
+    """
+    On-disk cache of derivatives with a size budget, evicting the least recently used ones.
+    Derivatives are stored in a directory per content hash of their source image.
+    """
+    def __init__(self, root: str, max_size: int):
+        self.root = root
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, int] = None
+        """Maps paths of cached derivatives to their size, from least to most recently used. Loaded from disk on first use."""
+        self.size = 0
+
+    def get_path(self, content_hash: str, key: str) -> str:
+        """Returns the absolute path of a derivative."""
+        return os.path.join(self.root, content_hash[:2], content_hash, key)
+
+    def get(self, content_hash: str, key: str) -> bytes | None:
+        """Returns a cached derivative, or None if it's not cached."""
+        path = self.get_path(content_hash, key)
+        with self.lock:
+            self._load()
+            if path not in self.entries:
+                return None
+            self.entries.move_to_end(path)
+        try:
+            os.utime(path) # Keep the order of use across restarts
+            with open(path, "rb") as derivative:
+                return derivative.read()
+        except FileNotFoundError: # Evicted by another process
+            with self.lock:
+                self.size -= self.entries.pop(path, 0)
+            return None
+
+    def put(self, content_hash: str, key: str, derivative: bytes):
+        """Caches a derivative, evicting others if the cache is over budget."""
+        path = self.get_path(content_hash, key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so readers never see partial derivatives
+        descriptor, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as temp_file:
+                temp_file.write(derivative)
+            os.replace(temp_path, path)
+        except Exception as e:
+            os.remove(temp_path)
+            raise e
+
+        with self.lock:
+            self._load()
+            self.size += len(derivative) - self.entries.pop(path, 0)
+            self.entries[path] = len(derivative)
+            while self.size > self.max_size and self.entries:
+                evicted_path, evicted_size = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                try:
+                    os.remove(evicted_path)
+                except FileNotFoundError:
+                    pass
+
+    def invalidate(self, content_hash: str):
+        """Removes all derivatives of an image."""
+        directory = os.path.dirname(self.get_path(content_hash, ""))
+        with self.lock:
+            self._load()
+            for path in [path for path in self.entries if os.path.dirname(path) == directory]:
+                self.size -= self.entries.pop(path)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def _load(self):
+        """Indexes the derivatives on disk, if not done yet. Must be called with the lock held."""
+        if self.entries == None:
+            found = []
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, path, stat.st_size))
+            found.sort()
+            self.entries = OrderedDict((path, size) for _, path, size in found)
+            self.size = sum(self.entries.values())
+
+CACHE = DerivativeCache(CONFIG.IMAGE_CACHE_PATH, CONFIG.IMAGE_CACHE_SIZE * 1024 * 1024)
+
+_executor: ProcessPoolExecutor = None
+_pending: dict[str, Future] = {} # Derivatives being rendered, by path.
+_lock = threading.Lock()
+
+def render(content_hash: str, content: bytes, width: int | None, height: int | None, format: str) -> Future:
+    """
+    Renders a derivative in the process pool and caches it.
+    Concurrent requests for the same derivative share a single render.
+    """
+    global _executor
+    key = get_derivative_key(width, height, format)
+    path = CACHE.get_path(content_hash, key)
+    with _lock:
+        future = _pending.get(path)
+        if future:
+            return future
+        if _executor == None:
+            _executor = ProcessPoolExecutor(max_workers=CONFIG.IMAGE_WORKERS)
+        future = _executor.submit(render_derivative, content, width, height, format)
+        _pending[path] = future
+
+    def on_rendered(future: Future):
+        if not future.cancelled() and future.exception() == None:
+            CACHE.put(content_hash, key, future.result())
+        with _lock:
+            _pending.pop(path, None)
+    future.add_done_callback(on_rendered)
+
+    return future
+
+def shutdown():
+    """
+    Stops the worker processes.
+    """
+    global _executor
+    with _lock:
+        if _executor != None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
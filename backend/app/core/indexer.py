@@ -0,0 +1,224 @@
+"""
+    Maintenance of the articles search index:
+    creating and rebuilding it, and a background worker that applies queued article changes to it.
+"""
+from typing import Iterator
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import parallel_bulk
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from core.config import CONFIG, SessionLocal
+from models.article import Article
+from models.search import SearchIndexTask
+from schemas.search import ReindexResult
+from datetime import datetime, timezone
+import crud.article as ArticleCrud
+import crud.search as SearchCrud
+import threading
+import warnings
+import time
+
+POLL_INTERVAL = 1 # Seconds to wait before checking for tasks again when none are due.
+
+ARTICLES_ALIAS = "articles"
+"""Alias that all searches and writes go through; points to the current versioned articles index."""
+ARTICLES_INDEX_SETTINGS = {
+    "analysis": {
+        "analyzer": {
+            "default": {
+                # Standardize all text fields; will make them lowercase, remove stopwords, stub/stem them (ex. remove verbal tense)
+                "type": "standard",
+            }
+        }
+    }
+}
+ARTICLES_INDEX_MAPPINGS = {
+    "properties": {
+        "title": {"type": "text"},
+        "authors": {"type": "text"},
+        "content": {"type": "search_as_you_type"},
+        "headings": {"type": "text"},
+        "summary": {"type": "search_as_you_type"},
+        "tags": {"type": "keyword"},
+    }
+}
+
+def create_articles_index(es: Elasticsearch, alias: bool=False) -> str:
+    """
+    Creates a new versioned index for articles and returns its name.
+    If alias is set, the articles alias is pointed to it.
+    """
+    index = ARTICLES_ALIAS + "_" + datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    es.indices.create(index=index, settings=ARTICLES_INDEX_SETTINGS, mappings=ARTICLES_INDEX_MAPPINGS, aliases={ARTICLES_ALIAS: {}} if alias else None)
+    return index
+
+def iter_article_actions(db: Session, index: str) -> Iterator[dict]:
+    """
+    Yields bulk index actions for all articles.
+    Articles are streamed from the DB with a server-side cursor, one batch at a time.
+    """
+    articles = db.scalars(select(Article).options(selectinload(Article.authors), selectinload(Article.tags)).order_by(Article.id).execution_options(yield_per=CONFIG.SEARCH_INDEX_BATCH_SIZE))
+    for article in articles:
+        yield {
+            "_index": index,
+            "_id": str(article.id),
+            "_source": ArticleCrud.create_elasticsearch_document(article),
+        }
+
+def reindex_articles(db: Session, es: Elasticsearch) -> ReindexResult:
+    """
+    Rebuilds the articles index from the DB into a new versioned index with parallel bulk requests,
+    then atomically points the alias to it and deletes the previous index.
+    Searches keep using the previous index until the new one is complete.
+    Queued changes are held back while rebuilding, and the ones queued since it started are then applied to the new index.
+    """
+    timer = time.perf_counter()
+    SearchCrud.lock_reindexing(db)
+    last_task_id = SearchCrud.get_last_task_id(db) # Changes queued after this may not be seen by the bulk load
+    index = create_articles_index(es)
+    es.indices.put_settings(index=index, settings={"refresh_interval": "-1"}) # Refreshing is unnecessary until the index is live
+
+    # Bulk load all articles
+    indexed = 0
+    errors = []
+    for ok, item in parallel_bulk(es, iter_article_actions(db, index), thread_count=CONFIG.SEARCH_REINDEX_WORKERS, chunk_size=CONFIG.SEARCH_INDEX_BATCH_SIZE, raise_on_error=False, raise_on_exception=False):
+        if ok:
+            indexed += 1
+        else:
+            errors.append(item)
+    if len(errors) > 0: # Keep the previous index rather than serving an incomplete one
+        es.indices.delete(index=index)
+        raise ValueError(f"Failed to index {len(errors)} articles, ex. {errors[0]}")
+    es.indices.put_settings(index=index, settings={"refresh_interval": None})
+    es.indices.refresh(index=index)
+
+    # Swap the alias to the new index in a single request
+    previous_indices = list(es.indices.get_alias(name=ARTICLES_ALIAS).keys()) if es.indices.exists_alias(name=ARTICLES_ALIAS) else []
+    actions = [{"add": {"index": index, "alias": ARTICLES_ALIAS}}]
+    actions.extend({"remove": {"index": previous_index, "alias": ARTICLES_ALIAS}} for previous_index in previous_indices)
+    if len(previous_indices) == 0 and es.indices.exists(index=ARTICLES_ALIAS): # Index from before versioned indices were used
+        actions.append({"remove_index": {"index": ARTICLES_ALIAS}})
+    es.indices.update_aliases(actions=actions)
+    for previous_index in previous_indices:
+        es.indices.delete(index=previous_index)
+
+    # Replay the changes queued while loading, including deletions, as the bulk load may have read articles before them
+    # Failed ones are left for the indexer to retry
+    while True:
+        tasks = SearchCrud.claim_tasks_after(db, last_task_id, CONFIG.SEARCH_INDEX_BATCH_SIZE)
+        if len(tasks) == 0:
+            break
+        last_task_id = tasks[-1].id
+        apply_tasks(db, es, tasks, index)
+    db.commit()
+
+    seconds = time.perf_counter() - timer
+    return ReindexResult(
+        index=index,
+        indexed_articles=indexed,
+        seconds=seconds,
+        articles_per_second=indexed / seconds if seconds > 0 else 0,
+    )
+
+def create_bulk_operations(db: Session, tasks: list[SearchIndexTask], index: str=ARTICLES_ALIAS) -> tuple[list[dict], list[list[SearchIndexTask]]]:
+    """
+    Creates the ES bulk operations that apply tasks to an index, with one operation per article.
+    Returns the operations and the tasks applied by each of them.
+    """
+    tasks_by_article: dict[int, list[SearchIndexTask]] = {}
+    for task in tasks:
+        tasks_by_article.setdefault(task.article_id, []).append(task)
+    articles = db.query(Article).filter(Article.id.in_(tasks_by_article.keys())).options(selectinload(Article.authors), selectinload(Article.tags)).all()
+    articles_by_id = {article.id: article for article in articles}
+
+    operations = []
+    for article_id in tasks_by_article:
+        article = articles_by_id.get(article_id)
+        if article:
+            operations.append({"index": {"_index": index, "_id": str(article_id)}})
+            operations.append(ArticleCrud.create_elasticsearch_document(article))
+        else: # Article was deleted
+            operations.append({"delete": {"_index": index, "_id": str(article_id)}})
+    return operations, list(tasks_by_article.values())
+
+def apply_tasks(db: Session, es: Elasticsearch, tasks: list[SearchIndexTask], index: str=ARTICLES_ALIAS) -> int:
+    """
+    Applies tasks to an index with a single bulk request, completing the ones that succeeded and scheduling retries of the rest.
+    Returns the amount of tasks completed. Does not commit.
+    """
+    operations, operation_tasks = create_bulk_operations(db, tasks, index)
+
+    try:
+        response = es.bulk(operations=operations)
+    except Exception as e: # Retry the whole batch later
+        SearchCrud.fail_tasks(db, tasks, str(e))
+        return 0
+
+    completed = 0
+    for item, item_tasks in zip(response["items"], operation_tasks):
+        error = get_bulk_item_error(item)
+        if error:
+            SearchCrud.fail_tasks(db, item_tasks, error)
+        else:
+            SearchCrud.complete_tasks(db, item_tasks)
+            completed += len(item_tasks)
+    return completed
+
+def get_bulk_item_error(item: dict) -> str | None:
+    """
+    Returns the error of an item of a bulk response, or None if it succeeded.
+    """
+    action, result = next(iter(item.items()))
+    if result["status"] < 300 or (action == "delete" and result["status"] == 404): # Documents to delete might've never been indexed
+        return None
+    return str(result.get("error", result["status"]))
+
+class SearchIndexer:
+    """
+    Drains the queue of search index tasks in a thread, in batches.
+    Multiple instances (ex. in different processes) may run at once, as each claims different tasks.
+    """
+    def __init__(self, es: Elasticsearch):
+        self.es = es
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+
+    def start(self):
+        """Starts the worker thread."""
+        self.thread = threading.Thread(target=self.run, name="search-indexer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the worker thread, waiting for its current batch to finish."""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        """Processes batches until stopped, waiting while there are no due tasks."""
+        while not self.stop_event.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                warnings.warn("Exception while processing search index tasks: " + str(e))
+                processed = 0
+            if processed == 0:
+                self.stop_event.wait(POLL_INTERVAL)
+
+    def process_batch(self) -> int:
+        """
+        Applies a batch of tasks with a single bulk request.
+        Returns the amount of tasks applied.
+        """
+        db = SessionLocal()
+        try:
+            if not SearchCrud.try_lock_task_batch(db): # The reindex applies the changes queued meanwhile
+                return 0
+            tasks = SearchCrud.claim_tasks(db, CONFIG.SEARCH_INDEX_BATCH_SIZE)
+            if len(tasks) == 0:
+                return 0
+            completed = apply_tasks(db, self.es, tasks)
+            db.commit()
+            return completed
+        finally:
+            db.close()
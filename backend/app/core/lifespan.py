@@ -4,14 +4,18 @@
 from contextlib import asynccontextmanager
 from elasticsearch import Elasticsearch
 from fastapi import FastAPI
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from schemas.site import SocialNetworkInput
-from core.utils import get_elastic_search
-from core.config import CONFIG, SOCIAL_NETWORKS, SessionLocal
-from models.user import User
+from core.utils import create_async_elastic_search, create_elastic_search
+from core.config import CONFIG, SOCIAL_NETWORKS, SessionLocal, async_engine
+import core.indexer as Indexer
+import core.migrations as Migrations
 from crud.user import create_default_admin
-from crud.category import create_root_category
+from crud.category import create_root_category, refresh_cached_paths
 from crud.site import try_create_config, register_social_network
+from crud.search import create_missing_search_documents
+import core.images as Images
 import time
 
 @asynccontextmanager
@@ -21,16 +25,25 @@ async def lifespan(app: FastAPI):
     # Wait until the database is ready to accept connections
     while True:
         try:
-            db.query(User).first()
+            db.execute(text("SELECT 1"))
             break
         except Exception as e:
             print("Database not ready (", str(e), "), retrying in 1 second")
             time.sleep(1)
 
+    # Refuse to serve requests with an outdated schema; migrations are applied before startup
+    Migrations.check_revision(db)
+
     # Ensure essential entities exist
     try_create_config(db)
     create_default_admin(db)
     create_root_category(db)
+    refresh_cached_paths(db)
+
+    # Create search documents for articles that predate them
+    created_documents = create_missing_search_documents(db)
+    if created_documents > 0:
+        print(f"Created search documents for {created_documents} articles")
 
     # Register social networks
     for network_id, name in SOCIAL_NETWORKS.items():
@@ -39,34 +52,38 @@ async def lifespan(app: FastAPI):
             name=name
         ))
 
-    # Initialize ES indices if it's enabled
+    # Create ES clients shared by all requests, and initialize indices if it's enabled
+    app.state.es = None
+    app.state.es_async = None
+    app.state.search_indexer = None
     if CONFIG.ES_ENABLED:
-        es: Elasticsearch = Elasticsearch([CONFIG.ES_URL], basic_auth=(CONFIG.ES_USERNAME, CONFIG.ES_PASSWORD))
+        es: Elasticsearch = create_elastic_search()
+        app.state.es = es
+        app.state.es_async = create_async_elastic_search()
         while not es.ping():
             print("Waiting for Elasticsearch to start...")
             time.sleep(1)
 
-        # Create ES indices and mappings
-        # es.indices.delete(index="articles")
-        if not es.indices.exists(index="articles"):
-            es.indices.create(index="articles", settings={
-                "analysis": {
-                    "analyzer": {
-                        "default": {
-                            # Standardize all text fields; will make them lowercase, remove stopwords, stub/stem them (ex. remove verbal tense)
-                            "type": "standard",
-                        }
-                    }
-                }
-            })
-            es.indices.put_mapping(index="articles", properties={
-                "title": {"type": "text"},
-                "authors": {"type": "text"},
-                "content": {"type": "search_as_you_type"},
-                "summary": {"type": "search_as_you_type"},
-                "tags": {"type": "keyword"},
-            })
+        # Create the articles index on first run
+        if not es.indices.exists(index=Indexer.ARTICLES_ALIAS):
+            Indexer.create_articles_index(es, alias=True)
+
+        # Start applying queued article changes to the index
+        app.state.search_indexer = Indexer.SearchIndexer(es)
+        app.state.search_indexer.start()
 
-        es.close()
+    db.close()
 
     yield
+
+    # Stop indexing and close ES connections
+    if app.state.search_indexer:
+        app.state.search_indexer.stop()
+    if app.state.es:
+        app.state.es.close()
+        await app.state.es_async.close()
+
+    # Stop image resizing workers
+    Images.shutdown()
+
+    await async_engine.dispose()
@@ -0,0 +1,38 @@
+"""
+    Checks of the DB schema against the Alembic migrations.
+"""
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.orm import Session
+import os
+
+ALEMBIC_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+
+def get_alembic_config() -> Config:
+    """
+    Returns the Alembic config of the app.
+    """
+    return Config(ALEMBIC_CONFIG_PATH)
+
+def get_head_revision() -> str:
+    """
+    Returns the latest revision of the migrations.
+    """
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+def get_current_revision(db: Session) -> str | None:
+    """
+    Returns the revision that the DB schema was last migrated to, or None if it was never migrated.
+    """
+    return MigrationContext.configure(db.connection()).get_current_revision()
+
+def check_revision(db: Session):
+    """
+    Raises if the DB schema is not at the latest revision.
+    Migrations are applied separately from app startup, with `alembic upgrade head`.
+    """
+    current_revision = get_current_revision(db)
+    head_revision = get_head_revision()
+    if current_revision != head_revision:
+        raise ValueError(f"The database schema is at revision {current_revision}, but the app requires {head_revision}; run `alembic upgrade head` to migrate it")
@@ -9,18 +9,108 @@ from schemas.user import TokenPayload, UserLogin
 from sqlalchemy.orm import Session
 from core.config import get_db
 from core.config import CONFIG
+from core.cache import LRUCache
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt
 import jwt as jtwUtil
+import urllib.request
+import threading
+import warnings
+import json
+import time
+import re
 
 GOOGLE_API_KEYS_URL = "https://www.googleapis.com/oauth2/v3/certs" # Google auth public keys
 GOOGLE_JWT_ISSUER = "https://accounts.google.com" # For extra token validation checks
+JWKS_DEFAULT_MAX_AGE = 3600 # Seconds to cache signing keys for, if their response doesn't specify it.
+JWKS_MIN_REFRESH_INTERVAL = 60 # Min seconds between background refreshes of signing keys.
+JWKS_TIMEOUT = 10 # Timeout for fetching signing keys, in seconds.
+MAX_AGE_REGEX = re.compile(r"max-age=(\d+)")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with a cost factor other than the configured one are flagged as needing an update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=CONFIG.BCRYPT_ROUNDS, bcrypt__min_rounds=CONFIG.BCRYPT_ROUNDS, bcrypt__max_rounds=CONFIG.BCRYPT_ROUNDS)
 get_HTTPBearer = HTTPBearer()
 get_optional_HTTPBearer = HTTPBearer(auto_error=False) # For endpoints that admit auth for extra functionality, but don't require it.
 
+_verified_tokens = LRUCache(CONFIG.AUTH_CACHE_SIZE) # User IDs of recently verified tokens.
+
+# bcrypt releases the GIL, so threads can hash in parallel
+_hashing_executor = ThreadPoolExecutor(max_workers=CONFIG.PASSWORD_HASHING_WORKERS, thread_name_prefix="password-hashing")
+_hashing_slots = threading.BoundedSemaphore(CONFIG.PASSWORD_HASHING_WORKERS + CONFIG.PASSWORD_HASHING_QUEUE_SIZE) # Running and queued operations.
+
+class PasswordHashingBusyError(Exception):
+    """
+    Raised when too many password operations are already running or queued.
+    """
+
+class JWKSCache:
+    """
+    Process-wide cache of the signing keys published at a JWKS URL.
+    Keys are kept for as long as their response's Cache-Control max-age allows, then refreshed in a background thread;
+    lookups only wait for the network if keys were never fetched.
+    """
+    def __init__(self, url: str):
+        self.url = url
+        self.keys: dict[str, jtwUtil.PyJWK] = {}
+        self.expiration_time = 0.0 # Monotonic time after which the keys are stale.
+        self.last_refresh_time: float = None # Monotonic time of the last refresh attempt.
+        self.lock = threading.Lock()
+        self.refresh_thread: threading.Thread = None
+
+    def get_signing_key(self, key_id: str) -> jtwUtil.PyJWK:
+        """
+        Returns a signing key by its ID.
+        Raises ValueError if the key is unknown; the keys are then refreshed in the background, in case they were rotated.
+        """
+        if self.last_refresh_time == None:
+            with self.lock: # Only one request fetches the first keys
+                if self.last_refresh_time == None:
+                    self.try_refresh()
+        elif time.monotonic() >= self.expiration_time:
+            self.refresh_in_background() # Stale keys are still used meanwhile
+
+        key = self.keys.get(key_id)
+        if not key:
+            self.refresh_in_background()
+            raise ValueError("Unknown signing key")
+        return key
+
+    def refresh(self):
+        """
+        Fetches the keys.
+        """
+        try:
+            with urllib.request.urlopen(self.url, timeout=JWKS_TIMEOUT) as response:
+                key_set = jtwUtil.PyJWKSet.from_dict(json.load(response))
+                max_age_match = MAX_AGE_REGEX.search(response.headers.get("Cache-Control", ""))
+        finally:
+            self.last_refresh_time = time.monotonic()
+        self.keys = {key.key_id: key for key in key_set.keys}
+        self.expiration_time = time.monotonic() + (int(max_age_match.group(1)) if max_age_match else JWKS_DEFAULT_MAX_AGE)
+
+    def try_refresh(self):
+        """
+        Fetches the keys, warning on failure rather than raising.
+        """
+        try:
+            self.refresh()
+        except Exception as e:
+            warnings.warn(f"Failed to fetch signing keys from {self.url}: {e}")
+
+    def refresh_in_background(self):
+        """
+        Starts fetching the keys in a thread, unless a refresh is already running or one was attempted recently.
+        """
+        with self.lock:
+            if (self.refresh_thread and self.refresh_thread.is_alive()) or (self.last_refresh_time != None and time.monotonic() - self.last_refresh_time < JWKS_MIN_REFRESH_INTERVAL):
+                return
+            self.refresh_thread = threading.Thread(target=self.try_refresh, name="jwks-refresh", daemon=True)
+            self.refresh_thread.start()
+
+google_jwks = JWKSCache(GOOGLE_API_KEYS_URL)
+
 def create_access_token(subject: str, expires_delta: timedelta=None) -> str:
     """
         Creates a JWT token.
@@ -39,10 +129,8 @@ def create_access_token(subject: str, expires_delta: timedelta=None) -> str:
 def decode_google_jwt_token(token: str) -> dict[str, Any]:
     """Decodes and validates a google identity services token."""
     try:
-        jwks_url = GOOGLE_API_KEYS_URL
-        jwks_client = jtwUtil.PyJWKClient(jwks_url)
         header = jtwUtil.get_unverified_header(token)
-        key = jwks_client.get_signing_key(header["kid"]).key
+        key = google_jwks.get_signing_key(header["kid"]).key
         decoded = jtwUtil.decode(token, key, [header["alg"]], audience=CONFIG.GOOGLE_CLIENT_URL)
         
         # Validate issuer
@@ -53,8 +141,48 @@ def decode_google_jwt_token(token: str) -> dict[str, Any]:
     
     return decoded
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def get_verified_token_user_id(token: str) -> int | None:
+    """
+    Returns the ID of the user of a recently verified token, if it's cached.
+    """
+    return _verified_tokens.get(token)
+
+def cache_verified_token(token: str, user_id: int, expiration_time: float | None):
+    """
+    Caches the user of a verified token, so it doesn't need to be verified again on every request.
+    Tokens are cached for AUTH_CACHE_TTL seconds at most, and never past expiration_time (their exp claim, as a UNIX timestamp).
+    """
+    ttl = CONFIG.AUTH_CACHE_TTL
+    if expiration_time != None:
+        ttl = min(ttl, expiration_time - time.time())
+    if ttl > 0:
+        _verified_tokens.put(token, user_id, ttl)
+
+def invalidate_verified_tokens(user_id: int):
+    """
+    Removes the cached tokens of a user, so they are verified again on their next use.
+    Only affects the current process; other processes' caches expire after AUTH_CACHE_TTL.
+    """
+    _verified_tokens.pop_where(lambda cached_user_id: cached_user_id == user_id)
+
+def run_password_operation(function, *args):
+    """
+    Runs a password hashing operation in the hashing threads and waits for its result.
+    Raises PasswordHashingBusyError instead of queueing it if the queue is full.
+    """
+    if not _hashing_slots.acquire(blocking=False):
+        raise PasswordHashingBusyError("Too many password operations are in progress, try again later")
+    try:
+        return _hashing_executor.submit(function, *args).result()
+    finally:
+        _hashing_slots.release()
+
+def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifies a password against its hash.
+    Returns whether it matched, and a new hash for it if the current one was created with different settings.
+    """
+    return run_password_operation(pwd_context.verify_and_update, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return run_password_operation(pwd_context.hash, password)
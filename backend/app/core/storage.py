@@ -0,0 +1,193 @@
+"""
+    Storage backends for the contents of uploaded files.
+"""
+from typing import Iterator
+from sqlalchemy import LargeBinary, event, func, select
+from sqlalchemy.orm import Session, SessionTransaction
+from core.config import CONFIG, SessionLocal
+from models.file import File
+import tempfile
+import os
+
+CONTENT_CHUNK_SIZE = 256 * 1024 # Max bytes read at once when streaming file contents.
+
+class FileStorage:
+    """
+    Base class for backends that store file contents.
+    """
+    def save(self, db: Session, file: File, content: bytes):
+        """Stores the content of a file. The file's content hash must already be set."""
+        raise NotImplementedError()
+
+    def read(self, file: File) -> bytes:
+        """Returns the whole content of a file."""
+        raise NotImplementedError()
+
+    def iter_content(self, file: File, start: int, end: int) -> Iterator[bytes]:
+        """
+        Returns an iterator over the bytes of a file between two positions (inclusive), in chunks.
+        The iterator does not depend on the file's session.
+        """
+        raise NotImplementedError()
+
+    def release(self, db: Session, storage_path: str | None):
+        """
+        Frees stored content that is no longer referenced by a file, after it was deleted or moved.
+        Must be called after the change is committed; commits.
+        """
+        pass
+
+class DatabaseStorage(FileStorage):
+    """
+    Stores contents in the files table itself.
+    """
+    def save(self, db: Session, file: File, content: bytes):
+        file.content = content
+        file.storage_path = None
+
+    def read(self, file: File) -> bytes:
+        return file.content
+
+    def iter_content(self, file: File, start: int, end: int) -> Iterator[bytes]:
+        return self._iter_content(file.id, start, end)
+
+    def _iter_content(self, file_id: int, start: int, end: int) -> Iterator[bytes]:
+        """
+        Reads only one chunk from the DB at a time.
+        Uses its own session, as streamed responses are consumed after the request's session is closed.
+        """
+        db = SessionLocal()
+        try:
+            position = start
+            while position <= end:
+                length = min(CONTENT_CHUNK_SIZE, end - position + 1)
+                chunk = db.query(func.substring(File.content, position + 1, length, type_=LargeBinary)).filter(File.id == file_id).scalar() # SQL substrings are 1-indexed
+                if not chunk: # File was deleted or truncated mid-stream
+                    break
+                yield chunk
+                position += length
+        finally:
+            db.close()
+
+class LocalStorage(FileStorage):
+    """
+    Content-addressed store in the local filesystem.
+    Blobs are named by their SHA-256 hash and sharded into subdirectories by its first characters;
+    files with identical content share a single blob.
+    Saving and releasing a blob lock it until the transaction ends, so a blob cannot be deleted while an upload starts using it.
+    Blobs written by transactions that are rolled back are released afterwards.
+    """
+    def __init__(self, root: str):
+        self.root = root
+
+    def get_blob_path(self, content_hash: str) -> str:
+        """Returns the path of a blob relative to the store root."""
+        return os.path.join(content_hash[:2], content_hash[2:4], content_hash)
+
+    def get_absolute_path(self, file: File) -> str:
+        """Returns the absolute filesystem path of a file's content."""
+        return os.path.join(self.root, file.storage_path)
+
+    def save(self, db: Session, file: File, content: bytes):
+        storage_path = self.get_blob_path(file.content_hash)
+        absolute_path = os.path.join(self.root, storage_path)
+        lock_blob(db, storage_path)
+
+        # Identical content is only stored once
+        if not os.path.exists(absolute_path):
+            directory = os.path.dirname(absolute_path)
+            os.makedirs(directory, exist_ok=True)
+
+            # Write to a temporary file first so readers never see partial blobs
+            descriptor, temp_path = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(descriptor, "wb") as temp_file:
+                    temp_file.write(content)
+                os.replace(temp_path, absolute_path)
+            except Exception as e:
+                os.remove(temp_path)
+                raise e
+            db.info.setdefault("written_blobs", set()).add(storage_path)
+
+        file.storage_path = storage_path
+        file.content = None
+
+    def read(self, file: File) -> bytes:
+        with open(self.get_absolute_path(file), "rb") as blob:
+            return blob.read()
+
+    def iter_content(self, file: File, start: int, end: int) -> Iterator[bytes]:
+        return self._iter_content(self.get_absolute_path(file), start, end)
+
+    def _iter_content(self, absolute_path: str, start: int, end: int) -> Iterator[bytes]:
+        with open(absolute_path, "rb") as blob:
+            blob.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = blob.read(min(CONTENT_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                yield chunk
+                remaining -= len(chunk)
+
+    def release(self, db: Session, storage_path: str | None):
+        if not storage_path:
+            return
+        # Blobs are shared by files with identical content; only delete them once unreferenced
+        lock_blob(db, storage_path)
+        is_referenced = db.query(File.id).filter(File.storage_path == storage_path).first() != None
+        if not is_referenced:
+            try:
+                os.remove(os.path.join(self.root, storage_path))
+            except FileNotFoundError:
+                pass
+        db.commit()
+
+def lock_blob(db: Session, storage_path: str):
+    """
+    Locks a blob of the local storage until the transaction ends.
+    Keys are hashes of the path, so different blobs may rarely share a lock.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtext(storage_path))))
+
+@event.listens_for(Session, "after_commit")
+def _forget_written_blobs(session: Session):
+    """
+    Forgets the blobs written in a transaction once it's committed, as they are referenced by its files.
+    """
+    session.info.pop("written_blobs", None)
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_rolled_back_blobs(session: Session, transaction: SessionTransaction):
+    """
+    Releases the blobs written in a transaction that ended without committing.
+    """
+    if transaction.parent != None or "written_blobs" not in session.info: # Flushes and savepoints end inner transactions
+        return
+    db = SessionLocal() # The ended transaction's session may not be usable within its events
+    try:
+        for storage_path in session.info.pop("written_blobs"):
+            LOCAL_STORAGE.release(db, storage_path)
+    finally:
+        db.close()
+
+DATABASE_STORAGE = DatabaseStorage()
+LOCAL_STORAGE = LocalStorage(CONFIG.FILE_STORAGE_PATH)
+STORAGES: dict[str, FileStorage] = {
+    "database": DATABASE_STORAGE,
+    "local": LOCAL_STORAGE,
+}
+
+def get_default_storage() -> FileStorage:
+    """
+    Returns the backend that new contents are stored in.
+    """
+    if CONFIG.FILE_STORAGE not in STORAGES:
+        raise ValueError("Unknown file storage backend " + CONFIG.FILE_STORAGE)
+    return STORAGES[CONFIG.FILE_STORAGE]
+
+def get_storage(file: File) -> FileStorage:
+    """
+    Returns the backend that holds a file's content.
+    """
+    return LOCAL_STORAGE if file.storage_path != None else DATABASE_STORAGE
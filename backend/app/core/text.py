@@ -0,0 +1,118 @@
+"""
+    Extraction of plain text from article documents.
+    Documents use the Markdown-like format of the frontend editor (see frontend/src/editor/markdown).
+"""
+from dataclasses import dataclass, field
+from core.cache import LRUCache
+import hashlib
+import io
+import re
+
+WORDS_PER_MINUTE = 200 # Reading speed used for reading time estimates.
+EXCERPT_LENGTH = 250 # Max characters of excerpts; matches the summaries generated by the editor.
+CACHE_SIZE = 1024 # Max documents whose extracted text is cached.
+
+HEADING_REGEX = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_REGEX = re.compile(r"^(`{3,}|~{3,})")
+HORIZONTAL_RULE_REGEX = re.compile(r"^([-*_])(\s*\1){2,}\s*$")
+ALERT_HEADER_REGEX = re.compile(r"^\[!\w+\]\s*$")
+BLOCK_PREFIX_REGEX = re.compile(r"^\s*(>\s?)+|^\s*([-*+]|\d+[.)])\s+") # Blockquote and list item markers
+BLOCK_ATTRIBUTES_REGEX = re.compile(r"\s*\{[^{}]*=[^{}]*\}\s*$") # Trailing attributes, ex. paragraph alignment
+IMAGE_REGEX = re.compile(r"!\[([^\]]*)\]\([^)]*\)(\{[^}]*\})?")
+LINK_REGEX = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+FOOTNOTE_REGEX = re.compile(r"\[\^\d+--([^\]]*)\]")
+EMPHASIS_REGEX = re.compile(r"(\*\*|\*|~~)(?=\S)(.+?)(?<=\S)\1|(?<!\w)(__|_)(?=\S)(.+?)(?<=\S)\3(?!\w)")
+INLINE_CODE_REGEX = re.compile(r"`+([^`]*)`+")
+ESCAPE_REGEX = re.compile(r"\\([\\`*_{}\[\]()#+\-.!>~|])")
+ESCAPED_CHARACTER_REGEX = re.compile("[\ue000-\ue07f]") # Placeholders for escaped characters while stripping markup
+WORD_REGEX = re.compile(r"\w+")
+
+@dataclass
+class ExtractedText:
+    """Plain text contents of a document."""
+    text: str
+    headings: list[str] = field(default_factory=list)
+    word_count: int = 0
+
+    def get_reading_time(self) -> int:
+        """Returns the estimated minutes to read the document; at least 1."""
+        return max(1, round(self.word_count / WORDS_PER_MINUTE))
+
+    def get_excerpt(self) -> str:
+        """Returns the start of the text, for use as a summary."""
+        return " ".join(self.text.split())[:EXCERPT_LENGTH]
+
+def strip_inline_markup(line: str) -> str:
+    """
+    Removes the formatting of inline elements from a line, keeping their text.
+    """
+    line = ESCAPE_REGEX.sub(lambda match: chr(0xE000 + ord(match.group(1))), line) # Escaped characters are not markup
+    line = IMAGE_REGEX.sub(r"\1", line) # Images are replaced by their alt text
+    line = LINK_REGEX.sub(r"\1", line)
+    line = FOOTNOTE_REGEX.sub(lambda match: " " + match.group(1).replace("_", " "), line) # Footnotes encode spaces as underscores
+    line = INLINE_CODE_REGEX.sub(r"\1", line)
+    previous = None
+    while previous != line: # Emphasis marks may be nested
+        previous = line
+        line = EMPHASIS_REGEX.sub(lambda match: match.group(2) if match.group(2) != None else match.group(4), line)
+    return ESCAPED_CHARACTER_REGEX.sub(lambda match: chr(ord(match.group(0)) - 0xE000), line)
+
+def extract_text(content: bytes) -> ExtractedText:
+    """
+    Extracts the plain text, section headings and word count of a document, in a single pass over its lines.
+    """
+    lines = []
+    headings = []
+    word_count = 0
+    fence = None # Marker of the code block being read, if any
+    for line in io.TextIOWrapper(io.BytesIO(content), encoding="utf-8", errors="replace"):
+        line = line.rstrip("\n")
+
+        # Keep the contents of code blocks as-is
+        fence_match = FENCE_REGEX.match(line.strip())
+        if fence != None:
+            if fence_match and fence_match.group(1).startswith(fence):
+                fence = None
+                continue
+        elif fence_match:
+            fence = fence_match.group(1)
+            continue
+        else:
+            stripped = line.strip()
+            if stripped.startswith(":::") or HORIZONTAL_RULE_REGEX.match(stripped): # Embeds have no text
+                continue
+            heading_match = HEADING_REGEX.match(stripped)
+            if heading_match:
+                line = strip_inline_markup(heading_match.group(2))
+                headings.append(line)
+            else:
+                line = BLOCK_PREFIX_REGEX.sub("", line)
+                if ALERT_HEADER_REGEX.match(line):
+                    continue
+                line = strip_inline_markup(BLOCK_ATTRIBUTES_REGEX.sub("", line)).strip()
+
+        if line:
+            lines.append(line)
+            word_count += len(WORD_REGEX.findall(line))
+
+    return ExtractedText(
+        text="\n".join(lines),
+        headings=headings,
+        word_count=word_count,
+    )
+
+_cache = LRUCache(CACHE_SIZE)
+
+def get_extracted_text(content: bytes | None) -> ExtractedText:
+    """
+    Returns the extracted text of a document.
+    Results are cached by content hash, so unchanged documents are only parsed once.
+    """
+    if not content:
+        return ExtractedText(text="")
+    content_hash = hashlib.sha256(content).hexdigest()
+    extracted = _cache.get(content_hash)
+    if extracted == None:
+        extracted = extract_text(content)
+        _cache.put(content_hash, extracted)
+    return extracted
@@ -1,23 +1,30 @@
 """
     App-wide utility methods.
 """
-from elasticsearch import Elasticsearch
-from fastapi import Depends, HTTPException, status
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials
 from jose import jwt, JWTError, ExpiredSignatureError
 from schemas.user import TokenPayload
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from core.security import get_HTTPBearer, get_optional_HTTPBearer, decode_google_jwt_token
+from core.security import get_HTTPBearer, get_optional_HTTPBearer, decode_google_jwt_token, get_verified_token_user_id, cache_verified_token
 from core.config import CONFIG, get_db
-from crud.user import User, create_reader, get_by_oauth, get_by_username
+from crud.user import User, create_reader, get_by_id, get_by_oauth, get_by_username
 
 def get_current_user(db: Session=Depends(get_db), credentials: HTTPAuthorizationCredentials=Depends(get_HTTPBearer)) -> User:
     """
     Returns the user associated to a JWT token.
+    Verified tokens are cached, so that subsequent requests with them only need to fetch the user.
     Credits to Diego Hernandez.
     """
     token = credentials.credentials
+    user_id = get_verified_token_user_id(token)
+    if user_id != None:
+        user = get_by_id(db, user_id)
+        if user:
+            return user
+
     is_oauth = False
     try:
         payload = jwt.decode(token, CONFIG.SECRET_KEY, algorithms=[CONFIG.ALGORITHM])
@@ -52,6 +59,7 @@ def get_current_user(db: Session=Depends(get_db), credentials: HTTPAuthorization
     if (last_valid_from and (not issued_at or issued_at < last_valid_from)) and not is_oauth:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
+    cache_verified_token(token, user.id, payload.get("exp"))
     return user
 
 def get_current_user_optional(db: Session=Depends(get_db), credentials: HTTPAuthorizationCredentials=Depends(get_optional_HTTPBearer)) -> User:
@@ -63,12 +71,38 @@ def get_current_user_optional(db: Session=Depends(get_db), credentials: HTTPAuth
         return None
     return get_current_user(db, credentials)
 
-def get_elastic_search():
-    if CONFIG.ES_ENABLED:
-        es = Elasticsearch([CONFIG.ES_URL], basic_auth=(CONFIG.ES_USERNAME, CONFIG.ES_PASSWORD))
-        try:
-            yield es
-        finally:
-            es.close()
-    else:
-        yield None
+def create_elastic_search() -> Elasticsearch:
+    """
+    Creates an ES client with the configured connection settings.
+    Clients hold a connection pool and are meant to be shared by the whole app.
+    """
+    return Elasticsearch([CONFIG.ES_URL], basic_auth=(CONFIG.ES_USERNAME, CONFIG.ES_PASSWORD), **get_elastic_search_options())
+
+def create_async_elastic_search() -> AsyncElasticsearch:
+    """
+    Creates an async ES client with the configured connection settings.
+    """
+    return AsyncElasticsearch([CONFIG.ES_URL], basic_auth=(CONFIG.ES_USERNAME, CONFIG.ES_PASSWORD), **get_elastic_search_options())
+
+def get_elastic_search_options() -> dict:
+    """
+    Returns the connection pool, timeout and retry options for ES clients.
+    """
+    return {
+        "connections_per_node": CONFIG.ES_CONNECTIONS,
+        "request_timeout": CONFIG.ES_TIMEOUT,
+        "max_retries": CONFIG.ES_MAX_RETRIES,
+        "retry_on_timeout": True,
+    }
+
+def get_elastic_search(request: Request) -> Elasticsearch | None:
+    """
+    Returns the app's ES client, or None if ES is disabled.
+    """
+    return getattr(request.app.state, "es", None)
+
+def get_async_elastic_search(request: Request) -> AsyncElasticsearch | None:
+    """
+    Returns the app's async ES client, or None if ES is disabled.
+    """
+    return getattr(request.app.state, "es_async", None)
@@ -0,0 +1,86 @@
+"""
+    Async variants of the article CRUD read methods.
+    Outputs are built by the sync methods, run within the async session.
+"""
+from elasticsearch import AsyncElasticsearch
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.article import *
+from models.article import *
+import crud.article as ArticleCrud
+import crud.search as SearchCrud
+import crud.aio.category as CategoryAioCrud
+
+async def get_article_by_path(db: AsyncSession, category_path: str, article_url: str) -> Article:
+    """
+    Returns an article by its path.
+    """
+    category = await CategoryAioCrud.get_category_by_path(db, category_path)
+    article = await db.scalar(select(Article).where(Article.filename == article_url, Article.category_id == category.id).limit(1)) # Must have same filename and be within the category
+    if not article:
+        raise ValueError("There is no article at the path")
+    return article
+
+async def search_articles(db: AsyncSession, es: AsyncElasticsearch | None, text: str | None, tags: list[str] | None, authors: list[str] | None, limit: int) -> list[Article]:
+    """
+    Searches articles by text content.
+    Uses the full-text search documents in the DB if ES is disabled.
+    """
+    if not es:
+        return list(await db.scalars(SearchCrud.create_search_statement(text, tags, authors, limit)))
+
+    query = ArticleCrud.create_search_query(text, tags, authors)
+    results = await es.search(index="articles", query=query, size=limit)
+
+    # Fetch all hit articles in DB with a single query
+    article_ids = ArticleCrud.get_search_hit_ids(results)
+    articles = list(await db.scalars(select(Article).where(Article.id.in_(article_ids)))) if article_ids else []
+    return ArticleCrud.order_search_hits(article_ids, articles)
+
+async def get_latest_articles(db: AsyncSession, limit: int, skip: int=0, cursor: str=None) -> list[Article]:
+    """
+    Returns the latest published articles of the site.
+    """
+    result = await db.scalars(ArticleCrud.create_latest_articles_statement(limit, skip, cursor))
+    return list(result)
+
+async def get_total_posted_articles(db: AsyncSession) -> int:
+    """
+    Returns the amount of visible published articles.
+    """
+    count = ArticleCrud.get_cached_count("posted")
+    if count == None:
+        count = await db.scalar(select(func.count(Article.id)).where(Article.is_visible == True, Article.publish_time != None))
+        ArticleCrud.cache_count("posted", count)
+    return count
+
+async def get_all_tags(db: AsyncSession) -> list[Tag]:
+    """
+    Returns all tags that have been used on the site.
+    """
+    return list(await db.scalars(select(Tag)))
+
+async def create_article_output(db: AsyncSession, article: Article, is_draft: bool=False) -> ArticleOutput:
+    """
+    Creates an output schema for an article.
+    """
+    return await db.run_sync(lambda session: ArticleCrud.create_article_output(session, article, is_draft))
+
+async def create_search_output(db: AsyncSession, search_results: list[Article]) -> ArticleSearchResults:
+    """
+    Creates an output schema for article search results.
+    """
+    return ArticleSearchResults(
+        results=await db.run_sync(ArticleCrud.create_article_previews, search_results),
+    )
+
+async def create_latest_articles_output(db: AsyncSession, articles: list[Article], limit: int=None) -> ArticleLatestPosts:
+    """
+    Creates an output schema for the latest articles.
+    """
+    results = await db.run_sync(ArticleCrud.create_article_previews, articles)
+    return ArticleLatestPosts(
+        results=results,
+        total_articles=await get_total_posted_articles(db),
+        next_cursor=ArticleCrud.get_latest_articles_next_cursor(articles, limit) if limit != None else None,
+    )
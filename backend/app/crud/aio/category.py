@@ -0,0 +1,30 @@
+"""
+    Async variants of the category CRUD read methods.
+    Outputs are built by the sync methods, run within the async session.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.category import *
+from models.category import *
+import crud.category as CategoryCrud
+
+async def get_category_by_path(db: AsyncSession, path: str) -> Category:
+    """
+    Returns a category by its full path.
+    """
+    if len(path) == 0 or path[0] != "/":
+        raise ValueError("Paths must start with a leading slash " + path)
+
+    # Try to fetch the category via cached URL field
+    cached_category = await db.scalar(select(Category).where(Category.cached_url == path).limit(1))
+    if cached_category:
+        return cached_category
+
+    # Fall back to walking the path
+    return await db.run_sync(CategoryCrud.get_category_by_path, path)
+
+async def create_category_output(db: AsyncSession, category: Category, published_articles_only: bool=False, articles_amount: int=None, articles_skip: int=0, max_depth: int=None, subcategory_articles_amount: int=None, articles_cursor: str=None) -> CategoryOutput:
+    """
+    Creates a CategoryOutput schema for a category.
+    """
+    return await db.run_sync(lambda session: CategoryCrud.create_category_output(session, category, published_articles_only, articles_amount, articles_skip, max_depth, subcategory_articles_amount, articles_cursor))
@@ -0,0 +1,24 @@
+"""
+    Async variants of the site config CRUD read methods.
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.site import SiteConfig
+import crud.site as SiteCrud
+
+async def get_config(db: AsyncSession) -> SiteConfig:
+    """
+    Returns the site's configuration.
+    """
+    return await db.scalar(select(SiteConfig).limit(1))
+
+async def get_rendered_configuration_output(db: AsyncSession) -> tuple[bytes, str]:
+    """
+    Returns the site config output rendered as JSON, and its ETag.
+    Only renders the output if the cached one is outdated.
+    """
+    version = await db.scalar(select(SiteConfig.cache_version).limit(1))
+    cached = SiteCrud.get_cached_configuration_output(version)
+    if cached:
+        return cached
+    return await db.run_sync(SiteCrud.get_rendered_configuration_output)
@@ -2,20 +2,63 @@
     CRUD methods for article-related tables.
 """
 from elasticsearch import Elasticsearch
-from sqlalchemy.orm import Session
-from models.user import Editor
+from sqlalchemy import Select, event, inspect, select
+from sqlalchemy.orm import Session, selectinload
+from models.user import Editor, User
+from models.file import File
+from models.category import Category
 from schemas.article import *
 from models.article import *
 import crud.user as UserCrud
 import crud.category as CategoryCrud
 import crud.utils as CrudUtils
 import crud.file as FileCrud
+import crud.search as SearchCrud
+import core.text as TextExtraction
+from core.cache import LRUCache
 from datetime import datetime
+from itertools import chain
+from typing import Hashable
 import warnings
 import re
 
 PATCH_ARTICLE_EXCLUDED_FIELDS = set(["authors", "category_path", "publish_time", "tags", "draft_content", "content", "annotations"])
 SPLIT_CATEGORY_ARTICLE_PATH_REGEX = re.compile(r"(.+)\/([^\/]+)$") # Splits a path into category path and article filename.
+COUNTS_CACHE_SIZE = 1024 # Max article counts cached.
+COUNTS_CACHE_TTL = 30 # Seconds that article counts are cached for; bounds how long counts changed by other processes stay outdated.
+
+_counts_cache = LRUCache(COUNTS_CACHE_SIZE) # Article counts by count key.
+
+@event.listens_for(Session, "before_flush")
+def _track_counted_article_changes(session: Session, flush_context, instances):
+    """
+    Marks the session's transaction as changing article counts if it adds, deletes or moves articles.
+    """
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Article) or (isinstance(obj, Category) and obj in session.deleted): # Deleting categories deletes their articles
+            session.info["article_counts_changed"] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Article):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in ("category_id", "category", "is_visible", "publish_time")):
+                session.info["article_counts_changed"] = True
+                return
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_article_counts(session: Session):
+    """
+    Clears the cached article counts of the process once changes to them are committed.
+    """
+    if session.info.pop("article_counts_changed", False):
+        _counts_cache.clear()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_counted_article_changes(session: Session):
+    """
+    Forgets changes to article counts that were rolled back.
+    """
+    session.info.pop("article_counts_changed", None)
 
 def create_article(db: Session, category_path: str, article_input: ArticleInput, author: Editor) -> Article:
     """
@@ -47,6 +90,11 @@ def create_article(db: Session, category_path: str, article_input: ArticleInput,
     db.add(article)
     db.flush()
 
+    # Create the search documents within the same transaction
+    SearchCrud.update_search_document(db, article)
+    if SearchCrud.is_indexing_enabled():
+        SearchCrud.enqueue_article(db, article.id)
+
     db.commit()
 
     return article
@@ -161,6 +209,11 @@ def update_article(db: Session, article: Article, article_update: ArticleUpdate)
         tag_list = try_create_tags(db, article_update.tags)
         article.tags = tag_list
 
+    # Update the search documents within the same transaction
+    SearchCrud.update_search_document(db, article)
+    if SearchCrud.is_indexing_enabled():
+        SearchCrud.enqueue_article(db, article.id)
+
     db.commit()
     db.refresh(article)
     return article
@@ -215,9 +268,42 @@ def article_exists(db: Session, category_path: str, article_filename: str) -> bo
         pass
     return has_article
 
-def search_articles(db: Session, es: Elasticsearch, text: str | None, tags: list[str] | None, authors: list[str] | None, limit: int) -> list[Article]:
+def search_articles(db: Session, es: Elasticsearch | None, text: str | None, tags: list[str] | None, authors: list[str] | None, limit: int) -> list[Article]:
     """
     Searches articles by text content.
+    Uses the full-text search documents in the DB if ES is disabled.
+    """
+    if not es:
+        return list(db.scalars(SearchCrud.create_search_statement(text, tags, authors, limit)))
+
+    query = create_search_query(text, tags, authors)
+    results = es.search(index="articles", query=query, size=limit)
+
+    # Fetch all hit articles in DB with a single query
+    article_ids = get_search_hit_ids(results)
+    articles = db.query(Article).filter(Article.id.in_(article_ids)).all() if article_ids else []
+    return order_search_hits(article_ids, articles)
+
+def get_search_hit_ids(results) -> list[int]:
+    """
+    Returns the IDs of the articles hit by an ES search, in order of relevance.
+    """
+    return [int(hit["_id"]) for hit in results["hits"]["hits"]]
+
+def order_search_hits(article_ids: list[int], articles: list[Article]) -> list[Article]:
+    """
+    Orders articles fetched for search hits by the relevance order of the hits.
+    Hits whose articles no longer exist in the DB are dropped and reported in a single warning.
+    """
+    articles_by_id = {article.id: article for article in articles}
+    missing_ids = [article_id for article_id in article_ids if article_id not in articles_by_id]
+    if missing_ids:
+        warnings.warn(f"Article documents exist in ES but not in DB? {missing_ids}")
+    return [articles_by_id[article_id] for article_id in article_ids if article_id in articles_by_id]
+
+def create_search_query(text: str | None, tags: list[str] | None, authors: list[str] | None) -> dict:
+    """
+    Creates the ES query for searching articles.
     """
     query_should_clause = []
     # Text queries (title, content, etc.)
@@ -226,7 +312,7 @@ def search_articles(db: Session, es: Elasticsearch, text: str | None, tags: list
             "multi_match": {
                 "query": text,
                 "type": "phrase_prefix",
-                "fields": ["title", "content", "summary", "authors"],
+                "fields": ["title", "headings", "content", "summary", "authors"],
             }
         })
     # Tag keyword query
@@ -250,46 +336,36 @@ def search_articles(db: Session, es: Elasticsearch, text: str | None, tags: list
             }
         } for author in authors)
 
-    query = {
+    return {
         "bool": {
             "should": query_should_clause,
         }
     }
-    results = es.search(index="articles", query=query, size=limit)
-
-    # Fetch articles in DB
-    articles: list[Article] = []
-    for hit in results["hits"]["hits"]:
-        article_id = hit["_id"]
-        article = db.query(Article).filter(Article.id == article_id).first()
-        if article:
-            articles.append(article)
-        else:
-            warnings.warn(f"Article document exists in ES but not in DB? {article_id}")
-    return articles
 
-def get_latest_articles(db: Session, limit: int, skip: int) -> list[Article]:
+def get_latest_articles(db: Session, limit: int, skip: int=0, cursor: str=None) -> list[Article]:
     """
     Returns the latest published articles of the site.
     """
-    articles = db.query(Article).filter(Article.is_visible == True, Article.publish_time != None).order_by(Article.publish_time.desc()).limit(limit).offset(skip)
-    return articles
+    return list(db.scalars(create_latest_articles_statement(limit, skip, cursor)))
 
-def index_article_in_search(es: Elasticsearch, article: Article, text_content: str):
+def create_latest_articles_statement(limit: int, skip: int=0, cursor: str=None) -> Select:
     """
-    Indexes an article in ElasticSearch.
-
-    text_content is expected to be a raw transcript (no formatting).
+    Creates a query for the latest published articles of the site, from newest to oldest.
+    Pages after the first should be fetched with the cursor of the previous page, so the articles before it don't need to be scanned.
     """
-    es.index(index="articles", id=str(article.id), document=create_elasticsearch_document(article, text_content))
+    statement = select(Article).where(Article.is_visible == True, Article.publish_time != None).order_by(Article.publish_time.desc(), Article.id.desc())
+    if cursor:
+        publish_time, article_id = CrudUtils.decode_cursor(cursor, datetime, int)
+        statement = statement.where(CrudUtils.create_keyset_filter(Article.publish_time, Article.id, publish_time, article_id, descending=True))
+    return statement.limit(limit).offset(skip)
 
-def update_article_in_search(es: Elasticsearch, article: Article, text_content: str):
+def get_latest_articles_next_cursor(articles: list[Article], limit: int) -> str | None:
     """
-    Updates an article in ElasticSearch.
-    
-    text_content is expected to be a raw transcript (no formatting).
+    Returns the cursor for the page after a page of latest articles, or None if it was the last page.
     """
-    es.update(index="articles", id=str(article.id), doc=create_elasticsearch_document(article, text_content))
+    if len(articles) == 0 or len(articles) < limit:
+        return None
+    return CrudUtils.encode_cursor(articles[-1].publish_time, articles[-1].id)
 
 def create_tags_name_list(tags: list[Tag]) -> list[str]:
     """
@@ -310,6 +386,7 @@ def create_article_preview(db: Session, article: Article) -> ArticlePreview:
     Creates a preview schema for an article.
     """
     category_path = CategoryCrud.get_category_path(db, article.category)
+    extracted_text = TextExtraction.get_extracted_text(article.content)
     return CrudUtils.create_schema(article, ArticlePreview, {
         "category_path": category_path,
         "category_name": article.category.name,
@@ -317,10 +394,41 @@ def create_article_preview(db: Session, article: Article) -> ArticlePreview:
         "path": get_article_path(db, article),
         "authors": [UserCrud.create_user_output(author.user) for author in article.authors],
         "tags": create_tags_name_list(article.tags),
-        "comments_count": len(article.comments),
         "featured_image_path": article.featured_image.path if article.featured_image else None,
+        "summary": article.summary or extracted_text.get_excerpt(),
+        "reading_time": extracted_text.get_reading_time(),
     })
 
+def create_article_previews(db: Session, articles: list[Article]) -> list[ArticlePreview]:
+    """
+    Creates preview schemas for multiple articles,
+    loading their related entities in bulk rather than per article.
+    """
+    articles = list(articles)
+    if len(articles) == 0:
+        return []
+    article_ids = [article.id for article in articles]
+
+    # Populate the relationships of the articles with one query per relationship
+    db.query(Article).filter(Article.id.in_(article_ids)).options(*get_preview_loader_options()).all()
+
+    return [create_article_preview(db, article) for article in articles]
+
+def get_preview_loader_options() -> list:
+    """
+    Returns the eager loading options for the relationships used by article previews.
+    """
+    return [
+        selectinload(Article.category),
+        selectinload(Article.authors).selectinload(Editor.user).options(
+            selectinload(User.credentials),
+            selectinload(User.editor),
+        ),
+        selectinload(Article.authors).selectinload(Editor.avatar).load_only(File.path), # Avoid loading file contents
+        selectinload(Article.tags),
+        selectinload(Article.featured_image).load_only(File.path),
+    ]
+
 def get_article_path(db: Session, article: Article) -> str:
     """
     Returns the URL path to an article.
@@ -341,16 +449,34 @@ def get_total_posted_articles(db: Session) -> int:
     """
     Returns the amount of visible published articles.
     """
-    return db.query(Article).filter(Article.is_visible, Article.publish_time != None).count()
+    count = get_cached_count("posted")
+    if count == None:
+        count = db.query(Article).filter(Article.is_visible, Article.publish_time != None).count()
+        cache_count("posted", count)
+    return count
+
+def get_cached_count(key: Hashable) -> int | None:
+    """
+    Returns a cached article count.
+    """
+    return _counts_cache.get(key)
 
-def create_elasticsearch_document(article: Article, text_content: str) -> dict:
+def cache_count(key: Hashable, count: int):
     """
-    Creates an ES document for an article.
+    Caches an article count, until articles are added, deleted or moved by this process, or COUNTS_CACHE_TTL passes.
     """
+    _counts_cache.put(key, count, COUNTS_CACHE_TTL)
+
+def create_elasticsearch_document(article: Article) -> dict:
+    """
+    Creates an ES document for an article, from its published content.
+    """
+    extracted_text = TextExtraction.get_extracted_text(article.content)
     return {
         "title": article.title,
-        "content": text_content,
-        "summary": article.summary,
+        "content": extracted_text.text,
+        "headings": extracted_text.headings,
+        "summary": article.summary or extracted_text.get_excerpt(),
         "authors": [author.display_name for author in article.authors],
         "tags": [tag.name for tag in article.tags],
     }
@@ -394,11 +520,15 @@ def create_search_output(db: Session, search_results: list[Article]) -> ArticleS
     Creates an output schema for article search results.
     """
     return ArticleSearchResults(
-        results=[create_article_preview(db, article) for article in search_results],
+        results=create_article_previews(db, search_results),
     )
 
-def create_latest_articles_output(db: Session, articles: list[Article]) -> ArticleLatestPosts:
+def create_latest_articles_output(db: Session, articles: list[Article], limit: int=None) -> ArticleLatestPosts:
+    """
+    Creates an output schema for a page of the latest articles.
+    """
     return ArticleLatestPosts(
-        results=[create_article_preview(db, article) for article in articles],
+        results=create_article_previews(db, articles),
         total_articles=get_total_posted_articles(db),
+        next_cursor=get_latest_articles_next_cursor(articles, limit) if limit != None else None,
     )
\ No newline at end of file
@@ -1,12 +1,15 @@
 """
     CRUD methods for category-related tables.
 """
+from sqlalchemy import case, func, literal, select
 from sqlalchemy.orm import Session
 from schemas.category import *
 from models.category import *
 from models.article import Article
 import crud.article as ArticleCrud
+import crud.search as SearchCrud
 import crud.utils as CrudUtils
+from datetime import datetime
 
 UPDATE_CATEGORY_EXCLUDED_FIELDS = set("parent_category_path")
 
@@ -82,24 +85,45 @@ def create_category(db: Session, category_input: CategoryInput) -> Category:
     if category_input.description:
         category.description = category_input.description
     db.flush(category)
-    update_cached_url(db, category)
+    update_cached_paths(db, category)
 
     db.add(category)
     db.commit()
 
     return category
 
-def update_cached_url(db: Session, category: Category):
+def update_cached_paths(db: Session, category: Category, recursive: bool=True):
     """
-    Updates the cached full URL of a category and all its children.
+    Updates the cached full URL and breadcrumbs of a category and, optionally, all its descendants.
     """
-    try:
-        category.cached_url = get_category_path(db, category)
-        for subcategory in category.subcategories: # Update URL of child categories
-            update_cached_url(db, subcategory)
-    except Exception as e:
-        db.rollback()
-        raise e
+    if category.parent_id == None: # Root category case
+        _set_cached_paths(category, "/", [], recursive)
+    else:
+        parent = db.get(Category, category.parent_id)
+        _set_cached_paths(category, get_category_path(db, parent), get_category_breadcrumbs(db, parent), recursive)
+
+def _set_cached_paths(category: Category, parent_path: str, parent_breadcrumbs: list[str], recursive: bool):
+    """
+    Derives the cached paths of a category from its parent's, descending into subcategories if requested.
+    """
+    if category.parent_id == None:
+        category.cached_url = "/"
+        category.cached_breadcrumbs = ["/"]
+    else:
+        category.cached_url = CrudUtils.concatenate_path(parent_path, category.directory_name)
+        category.cached_breadcrumbs = parent_breadcrumbs + [category.name]
+
+    if recursive:
+        for subcategory in category.subcategories: # Update paths of child categories
+            _set_cached_paths(subcategory, category.cached_url, category.cached_breadcrumbs, recursive)
+
+def refresh_cached_paths(db: Session):
+    """
+    Recalculates the cached paths of all categories.
+    Backfills categories created before breadcrumbs were cached.
+    """
+    root_category = get_category_by_path(db, "/")
+    update_cached_paths(db, root_category)
     db.commit()
 
 def create_root_category(db: Session) -> Category:
@@ -119,12 +143,21 @@ def update_category(db: Session, category: Category, category_update: CategoryUp
     if category_update.parent_category_path != None:
         try:
             new_parent = get_category_by_path(db, category_update.parent_category_path)
+
+            # Prevent moving a category into its own subtree
+            new_parent_path = get_category_path(db, new_parent)
+            if new_parent.id == category.id or new_parent_path.startswith(category.cached_url + "/"):
+                raise ValueError("Cannot move a category into itself or its subcategories")
+
             category.parent_id = new_parent.id
-            update_cached_url(db, category)
         except Exception as e:
             db.rollback()
             raise e
 
+    # Refresh cached paths of the whole subtree if any of its path components changed
+    if category_update.parent_category_path != None or category_update.directory_name != None or category_update.name != None:
+        update_cached_paths(db, category)
+
     db.commit()
     db.refresh(category)
     return category
@@ -133,46 +166,33 @@ def get_category_path(db: Session, category: Category) -> str:
     """
     Returns the full path to a category.
     """
-    if category.parent_id == None: # Root category case
-        return "/"
-    else:
-        # Backtrack upwards to root
-        path = [category.directory_name]
-        parent = db.query(Category).filter(Category.id == category.parent_id).first()
-        while parent:
-            path.append(parent.directory_name)
-            parent = db.query(Category).filter(Category.id == parent.parent_id).first()
-
-        return "/".join(path[::-1])
+    if category.cached_url == None or category.cached_breadcrumbs == None: # Categories created before breadcrumbs were cached
+        update_cached_paths(db, category, recursive=False)
+    return category.cached_url
     
-def get_category_breadcrumbs(db: Session, category: Category) -> str:
+def get_category_breadcrumbs(db: Session, category: Category) -> list[str]:
     """
     Returns the names of the parent categories up until the passed category.
     """
-    if category.parent_id == None: # Root category case
-        return ["/"]
-    else:
-        # Backtrack upwards to root
-        path = [category.name]
-        parent = db.query(Category).filter(Category.id == category.parent_id).first()
-        while parent:
-            path.append(parent.name)
-            parent = db.query(Category).filter(Category.id == parent.parent_id).first()
+    if category.cached_url == None or category.cached_breadcrumbs == None: # Categories created before breadcrumbs were cached
+        update_cached_paths(db, category, recursive=False)
+    return category.cached_breadcrumbs
 
-        return path[::-1]
-
-def get_category_articles(db: Session, category: Category, published_only: bool, amount: int = None, skip: int = 0) -> list[Article]:
+def get_category_articles(db: Session, category: Category, published_only: bool, amount: int = None, skip: int = 0, cursor: str = None) -> list[Article]:
     """
     Returns the sorted posted articles of a category.
+    Pages after the first should be fetched with the cursor of the previous page, so the articles before it don't need to be scanned.
     """
     articles_query = db.query(Article).filter(Article.category_id == category.id)
 
     # Sort articles
-    sort_mode = category.sorting_type
-    if sort_mode == CategorySortingModeEnum.chronological:
-        articles_query = articles_query.order_by(Article.publish_time, Article.creation_time)
-    elif sort_mode == CategorySortingModeEnum.manual:
-        articles_query = articles_query.order_by(Article.category_sorting_index)
+    sort_column = get_articles_sort_column(category)
+    articles_query = articles_query.order_by(sort_column, Article.id)
+    if cursor:
+        sorting_type, sort_value, article_id = CrudUtils.decode_cursor(cursor, str, datetime if sort_column is Article.publish_time else int, int)
+        if sorting_type != category.sorting_type.name: # Sorting mode changed since the previous page
+            raise ValueError("Invalid cursor")
+        articles_query = articles_query.filter(CrudUtils.create_keyset_filter(sort_column, Article.id, sort_value, article_id))
 
     # Filter to published only
     if published_only:
@@ -185,26 +205,117 @@ def get_category_articles(db: Session, category: Category, published_only: bool,
 
     return articles_query.all()
 
-def create_category_output(db: Session, category: Category, published_articles_only: bool=False, articles_amount: int = None, articles_skip: int = 0) -> CategoryOutput:
+def get_articles_sort_column(category: Category) -> Column:
     """
-    Creates an output schema for a category.
+    Returns the article column that a category's sorting mode sorts by; ties are sorted by ID.
     """
-    
-    articles = [ArticleCrud.create_article_preview(db, article) for article in get_category_articles(db, category, published_articles_only, articles_amount, articles_skip)]
-    subcategories = [create_category_output(db, subcategory) for subcategory in category.subcategories] # Sorting is handled at SQLAlchemy level
-
-    return CategoryOutput(
-        id=category.id,
-        name=category.name,
-        description=category.description,
-        directory_name=category.directory_name,
-        view_type=CategoryViewEnum[category.view_type.name],
-        sorting_type=CategorySortingModeEnum[category.sorting_type.name],
-        path=get_category_path(db, category),
-        articles=articles,
-        total_articles=len(category.articles),
-        subcategories=subcategories,
-    )
+    if category.sorting_type == CategorySortingModeEnum.manual:
+        return Article.category_sorting_index
+    return Article.publish_time
+
+def get_category_articles_next_cursor(category: Category, articles: list[Article], amount: int = None) -> str | None:
+    """
+    Returns the cursor for the page after a page of a category's articles, or None if it was the last page.
+    """
+    if amount == None or len(articles) == 0 or len(articles) < amount:
+        return None
+    last_article = articles[-1]
+    return CrudUtils.encode_cursor(category.sorting_type.name, getattr(last_article, get_articles_sort_column(category).key), last_article.id)
+
+def create_category_output(db: Session, category: Category, published_articles_only: bool=False, articles_amount: int = None, articles_skip: int = 0, max_depth: int = None, subcategory_articles_amount: int = None, articles_cursor: str = None) -> CategoryOutput:
+    """
+    Creates an output schema for a category and its subtree.
+    The article filters only apply to the passed category; subcategories list all their articles, optionally limited to the first subcategory_articles_amount ones.
+    max_depth limits how many levels of subcategories are included; 0 includes none.
+    """
+    # Fetch the subtree, its article counts and articles in bulk
+    subtree = get_category_subtree(db, category, max_depth)
+    category_ids = [subcategory.id for subcategory, _ in subtree]
+    articles_counts = get_articles_counts(db, category_ids)
+    articles = {category.id: get_category_articles(db, category, published_articles_only, articles_amount, articles_skip, articles_cursor)}
+    articles.update(get_categories_articles(db, category_ids[1:], published_only=False, amount=subcategory_articles_amount))
+    article_previews = iter(ArticleCrud.create_article_previews(db, [article for category_articles in articles.values() for article in category_articles]))
+    article_previews = {category_id: [next(article_previews) for _ in category_articles] for category_id, category_articles in articles.items()}
+
+    # Build outputs bottom-up; the subtree is sorted by depth and name
+    outputs: dict[int, CategoryOutput] = {}
+    for subcategory, _ in reversed(subtree):
+        outputs[subcategory.id] = CategoryOutput(
+            id=subcategory.id,
+            name=subcategory.name,
+            description=subcategory.description,
+            directory_name=subcategory.directory_name,
+            view_type=CategoryViewEnum[subcategory.view_type.name],
+            sorting_type=CategorySortingModeEnum[subcategory.sorting_type.name],
+            path=get_category_path(db, subcategory),
+            articles=article_previews[subcategory.id],
+            total_articles=articles_counts.get(subcategory.id, 0),
+            subcategories=[],
+        )
+    for subcategory, _ in subtree[1:]:
+        outputs[subcategory.parent_id].subcategories.append(outputs[subcategory.id])
+
+    outputs[category.id].articles_next_cursor = get_category_articles_next_cursor(category, articles[category.id], articles_amount)
+    return outputs[category.id]
+
+def get_category_subtree(db: Session, category: Category, max_depth: int = None) -> list[tuple[Category, int]]:
+    """
+    Returns a category and all its descendants along with their depth relative to it, using a single recursive query.
+    Results are sorted by depth and then name, starting with the passed category.
+    """
+    tree = select(Category.id, literal(0).label("depth")).where(Category.id == category.id).cte("category_tree", recursive=True)
+    children = select(Category.id, (tree.c.depth + 1).label("depth")).join(tree, Category.parent_id == tree.c.id)
+    if max_depth != None:
+        children = children.where(tree.c.depth < max_depth)
+    tree = tree.union_all(children)
+
+    rows = db.query(Category, tree.c.depth).join(tree, Category.id == tree.c.id).order_by(tree.c.depth, Category.name).all()
+    return [(row[0], row[1]) for row in rows]
+
+def get_articles_counts(db: Session, category_ids: list[int]) -> dict[int, int]:
+    """
+    Returns the total amount of articles of each category, by category ID.
+    Counts are cached until articles are added, deleted or moved; only uncached ones are counted.
+    """
+    counts = {category_id: ArticleCrud.get_cached_count(("category", category_id)) for category_id in category_ids}
+    uncounted_ids = [category_id for category_id, count in counts.items() if count == None]
+    if len(uncounted_ids) > 0:
+        rows = db.query(Article.category_id, func.count(Article.id)).filter(Article.category_id.in_(uncounted_ids)).group_by(Article.category_id).all()
+        counted = {category_id: count for category_id, count in rows}
+        for category_id in uncounted_ids:
+            counts[category_id] = counted.get(category_id, 0)
+            ArticleCrud.cache_count(("category", category_id), counts[category_id])
+    return counts
+
+def get_categories_articles(db: Session, category_ids: list[int], published_only: bool, amount: int = None) -> dict[int, list[Article]]:
+    """
+    Returns the sorted articles of multiple categories, optionally limited to the first ones of each category.
+    """
+    if len(category_ids) == 0:
+        return {}
+
+    # Rank articles within each category, following each category's sorting mode
+    position = func.row_number().over(
+        partition_by=Article.category_id,
+        order_by=(
+            case((Category.sorting_type == CategorySortingModeEnum.manual, Article.category_sorting_index)), # Null for chronological categories
+            Article.publish_time,
+            Article.id,
+        ),
+    ).label("position")
+    ranked_articles = db.query(Article.id, position).join(Category, Article.category_id == Category.id).filter(Article.category_id.in_(category_ids))
+    if published_only:
+        ranked_articles = ranked_articles.filter(Article.is_visible, Article.publish_time != None)
+    ranked_articles = ranked_articles.subquery()
+
+    articles_query = db.query(Article).join(ranked_articles, Article.id == ranked_articles.c.id).order_by(ranked_articles.c.position)
+    if amount != None:
+        articles_query = articles_query.filter(ranked_articles.c.position <= amount)
+
+    articles = {category_id: [] for category_id in category_ids}
+    for article in articles_query.all():
+        articles[article.category_id].append(article)
+    return articles
 
 def get_by_id(db: Session, id: int) -> Category:
     """
@@ -235,5 +346,7 @@ def clear_category(db: Session, category: Category):
     Deletes all articles of a category.
     """
     for article in category.articles:
+        if SearchCrud.is_indexing_enabled(): # Queue deleting the search document
+            SearchCrud.enqueue_article(db, article.id)
         db.delete(article)
     db.commit()
\ No newline at end of file
@@ -1,12 +1,14 @@
 """
-    CRUD methods for category-related tables.
+    CRUD methods for comment-related tables.
 """
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from schemas.comment import *
 from models.comment import *
 from models.article import Article
 from models.user import User
 import crud.article as ArticleCrud
+import crud.site as SiteCrud
 import crud.user as UserCrud
 import crud.utils as CrudUtils
 
@@ -24,14 +26,16 @@ def create_comment(db: Session, user: User, article: Article, comment_input: Com
         content=comment_input.content,
     )
     comment.author = user
-    article.comments.append(comment)
-    db.refresh(article)
+    comment.article = article # Does not load the article's existing comments
     db.add(comment)
 
     # Attach to parent
     if comment_input.parent_comment_id:
         parent_comment = get_by_id(db, comment_input.parent_comment_id)
-        parent_comment.replies.append(comment)
+        comment.parent_comment = parent_comment
+
+    # Update counter in SQL to not lose concurrent increments
+    article.comments_count = Article.comments_count + 1
 
     db.commit()
     return comment
@@ -49,9 +53,39 @@ def delete_comment(db: Session, comment: Comment):
     """
     Deletes a comment and all its replies.
     """
+    # Replies are loaded anyways for the delete cascade
+    deleted_count = 1 + count_replies(comment)
+    db.query(Article).filter(Article.id == comment.article_id).update({Article.comments_count: Article.comments_count - deleted_count}, synchronize_session=False)
+
     db.delete(comment)
     db.commit()
 
+def count_replies(comment: Comment) -> int:
+    """
+    Returns the amount of replies to a comment, including nested ones.
+    """
+    return sum(1 + count_replies(reply) for reply in comment.replies)
+
+def recount_comments(db: Session):
+    """
+    Recalculates the comment counters of all articles from the comments table.
+    Intended for backfilling and repairing counters.
+    """
+    recount_article_comments(db, None)
+    db.commit()
+
+def recount_article_comments(db: Session, article_ids: list[int] | None):
+    """
+    Recalculates the comment counters of articles from the comments table; of all articles if article_ids is None.
+    Does not commit.
+    """
+    comments_count = select(func.count(Comment.id)).where(Comment.article_id == Article.id).scalar_subquery()
+    query = db.query(Article)
+    if article_ids != None:
+        query = query.filter(Article.id.in_(article_ids))
+    query.update({Article.comments_count: comments_count}, synchronize_session=False)
+    SiteCrud.invalidate_configuration_output(db) # Navigation article previews include the counters
+
 def get_by_id(db: Session, comment_id: int) -> Comment:
     """
     Returns a comment by its ID.
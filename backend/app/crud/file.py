@@ -1,28 +1,40 @@
 """
 CRUD methods for Files table.
 """
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Iterator
+from sqlalchemy.orm import Session, joinedload, load_only
+from core.storage import FileStorage, get_default_storage, get_storage
+import core.images as Images
 import crud.utils as CrudUtils
 from crud.user import create_user_output
-from models.user import User
+from models.user import Editor, User
 from models.file import *
 from schemas.file import *
-from collections import defaultdict
+import mimetypes
+import hashlib
 import base64
 
 PATCH_FILE_EXCLUDED_FIELDS = set(["id", "content"])
+DEFAULT_MIME_TYPE = "application/octet-stream"
 
-def create_file(db: Session, uploader: User, file_input: FileInput) -> File:
+def create_file(db: Session, uploader: User, file_input: FileInput, content: bytes=None) -> File:
     """
     Creates a file entry.
+    The content may be passed as bytes instead of within the input.
     """
     if get_by_path(db, file_input.path):
         raise ValueError("A file already exists at that path")
+    if content == None:
+        if file_input.content == None:
+            raise ValueError("File content is required")
+        content = decode_content(file_input.content)
 
     file = File(
         path=file_input.path,
-        content=decode_content(file_input.content),
+        mime_type=guess_mime_type(file_input.path),
     )
+    set_content(db, file, content)
     file.uploader = uploader
     db.add(file)
 
@@ -31,9 +43,10 @@ def create_file(db: Session, uploader: User, file_input: FileInput) -> File:
     
     return file
 
-def update_file(db: Session, file: File, file_update: FileUpdate) -> File:
+def update_file(db: Session, file: File, file_update: FileUpdate, content: bytes=None) -> File:
     """
     Updates a file's data.
+    The new content may be passed as bytes instead of within the update.
     """
     # Check new path is unused, if being changed
     if file_update.path:
@@ -42,15 +55,73 @@ def update_file(db: Session, file: File, file_update: FileUpdate) -> File:
             raise ValueError("A file already exists at that path")
 
     CrudUtils.patch_entity(file, file_update, PATCH_FILE_EXCLUDED_FIELDS)
+    if file_update.path:
+        file.mime_type = guess_mime_type(file_update.path)
 
     # Update content
+    previous_storage, previous_storage_path, previous_hash = get_storage(file), file.storage_path, file.content_hash
     if file_update.content:
-        file.content = decode_content(file_update.content)
+        content = decode_content(file_update.content)
+    if content != None:
+        set_content(db, file, content)
 
     db.commit()
+    if file.storage_path != previous_storage_path:
+        previous_storage.release(db, previous_storage_path)
+    if previous_hash and file.content_hash != previous_hash: # Resized versions of the old content are no longer served
+        Images.CACHE.invalidate(previous_hash)
     db.refresh(file)
     return file
 
+def set_content(db: Session, file: File, content: bytes, storage: FileStorage=None):
+    """
+    Sets a file's content and the metadata derived from it.
+    The content is stored in the configured storage backend, unless one is passed.
+    """
+    file.content_hash = hashlib.sha256(content).hexdigest()
+    file.size = len(content)
+    file.last_modified = datetime.now(timezone.utc)
+    (storage or get_default_storage()).save(db, file, content)
+
+def read_content(file: File) -> bytes:
+    """
+    Returns the whole content of a file.
+    """
+    return get_storage(file).read(file)
+
+def ensure_content_metadata(db: Session, file: File):
+    """
+    Calculates the content metadata of files uploaded before it was stored.
+    """
+    if file.content_hash == None:
+        last_modified = file.last_modified
+        set_content(db, file, read_content(file), get_storage(file))
+        file.last_modified = last_modified or file.last_modified
+        file.mime_type = guess_mime_type(file.path)
+        db.commit()
+
+def iter_content(file: File, start: int, end: int) -> Iterator[bytes]:
+    """
+    Returns an iterator over the bytes of a file's content between two positions (inclusive), in chunks.
+    Safe to consume after the file's session is closed.
+    """
+    return get_storage(file).iter_content(file, start, end)
+
+def migrate_to_storage(db: Session, storage: FileStorage) -> int:
+    """
+    Moves the contents of files stored in the DB to another storage backend, one file at a time.
+    Returns the amount of files moved.
+    """
+    file_ids = [file_id for file_id, in db.query(File.id).filter(File.storage_path == None).all()]
+    for file_id in file_ids:
+        file = db.get(File, file_id)
+        content = read_content(file)
+        ensure_content_metadata(db, file)
+        storage.save(db, file, content)
+        db.commit()
+        db.expunge(file) # Release the content from memory
+    return len(file_ids)
+
 def get_all(db: Session) -> list[File]:
     """
     Returns all files.
@@ -62,8 +133,12 @@ def delete_file(db: Session, file: File):
     """
     Deletes a file.
     """
+    storage, storage_path, content_hash = get_storage(file), file.storage_path, file.content_hash
     db.delete(file)
     db.commit()
+    storage.release(db, storage_path)
+    if content_hash:
+        Images.CACHE.invalidate(content_hash)
 
 def create_file_preview(db: Session, file: File) -> FilePreview:
     """
@@ -78,9 +153,10 @@ def create_file_output(db: Session, file: File) -> FileOutput:
     """
     Creates a FileOutput response for a file.
     """
+    ensure_content_metadata(db, file)
     return CrudUtils.create_schema(file, FileOutput, {
         "filename": get_filename(file),
-        "content": base64.b64encode(file.content).decode("ascii"),
+        "url": get_url(file),
         "uploader": create_user_output(file.uploader),
     })
 
@@ -96,51 +172,53 @@ def get_filename(file: File) -> str:
     """
     return file.path.split("/")[-1]
 
+def get_url(file: File) -> str:
+    """
+    Returns the API route of a file's content.
+    """
+    return "/files" + file.path
+
+def guess_mime_type(path: str) -> str:
+    """
+    Returns the MIME type of a file based on its extension.
+    """
+    mime_type, _ = mimetypes.guess_type(path)
+    return mime_type or DEFAULT_MIME_TYPE
+
 def decode_content(encoded_content: str) -> bytes:
     """
     Decodes base64-encoded bytes.
     """
     return base64.b64decode(encoded_content)
 
-def _get_file_tree_dict(paths: dict[str, File]) -> dict:
-    """
-    Returns a dict that maps files to a directory-like nested map.
-    Source: https://stackoverflow.com/a/58917078
-    """
-    new_path_dict = CrudUtils.nested_dict()
-    for path, file in paths.items():
-        parts = path.split('/') # Split by folder
-        if parts:
-            # Find the deepest folder for the file
-            marcher = new_path_dict 
-            for key in parts[:-1]:
-               marcher = marcher[key] # Create folder for the component
-            marcher[parts[-1]] = file # Map the file
-            
-    return CrudUtils.default_to_regular(new_path_dict)
-
-def build_tree_output(db: Session, current: FileTreeOutput, d: dict) -> FileTreeOutput:
-    for key, item in d.items():
-        if type(item) == dict:
-            subfolder = FileTreeOutput(folder_name=key, path=f"{current.path}/{key}", files=[], subfolders={})
-            subfolder = build_tree_output(db, subfolder, item)
-            current.subfolders[key] = subfolder
-        else:
-            current.files.append(create_file_preview(db, item))
-    return current
-
-def get_tree_output(db: Session) -> FileTreeOutput:
-    """
-    Returns all files in a tree structure schema.
-    """
-    files = get_all(db)
-    paths_dict = {file.path: file for file in files}
-    processed = _get_file_tree_dict(paths_dict)
-    if len(processed) == 0:
-        processed[""] = {}
-
-    new_dict = FileTreeOutput(folder_name="/", path="", files=[], subfolders={})
-    build_tree_output(db, new_dict, processed[""]) # Start from "/""
-    new_dict.path = "/"
-
-    return new_dict
\ No newline at end of file
+def get_tree_output(db: Session, path: str=None, limit: int=None, skip: int=0) -> FileTreeOutput:
+    """
+    Returns files in a tree structure schema.
+    If path is set, only files within that folder are included.
+    limit and skip paginate the files, in order of their paths.
+    """
+    # Fetch only the metadata that previews need
+    query = db.query(File).options(
+        load_only(File.id, File.path, File.uploader_id),
+        joinedload(File.uploader).options(
+            joinedload(User.credentials),
+            joinedload(User.editor).joinedload(Editor.avatar).load_only(File.path),
+        ),
+    )
+    if path and path != "/":
+        query = query.filter(File.path.startswith(path.rstrip("/") + "/", autoescape=True))
+    query = query.order_by(File.path).offset(skip)
+    if limit != None:
+        query = query.limit(limit)
+
+    root = FileTreeOutput(folder_name="/", path="/", files=[], subfolders={})
+    for file in query.all():
+        # Find or create the file's folder
+        folder = root
+        for folder_name in file.path.split("/")[1:-1]:
+            if folder_name not in folder.subfolders:
+                folder.subfolders[folder_name] = FileTreeOutput(folder_name=folder_name, path=CrudUtils.concatenate_path(folder.path, folder_name), files=[], subfolders={})
+            folder = folder.subfolders[folder_name]
+        folder.files.append(create_file_preview(db, file))
+
+    return root
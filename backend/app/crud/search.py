@@ -0,0 +1,168 @@
+"""
+    CRUD methods for the search indices:
+    the queue of pending ES index changes, and the full-text search documents used when ES is disabled.
+"""
+from sqlalchemy import Select, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import TSVECTOR, insert
+from sqlalchemy.orm import Session
+from core.config import CONFIG
+from models.article import Article, Tag
+from models.user import Editor
+from models.search import ArticleSearchDocument, SearchIndexTask
+from schemas.search import SearchIndexingStatus
+from datetime import datetime, timedelta, timezone
+import core.text as TextExtraction
+import re
+
+INDEXING_LOCK_ID = 7_304_162 # Arbitrary key of the advisory lock that reindexing holds exclusively, and batches of index tasks shared.
+TEXT_SEARCH_CONFIG = "simple" # Postgres text search configuration; does not stem words, as articles may be in any language.
+QUERY_WORD_REGEX = re.compile(r"\w+")
+
+def is_indexing_enabled() -> bool:
+    """
+    Returns whether article changes should be queued for indexing.
+    """
+    return bool(getattr(CONFIG, "ES_ENABLED", None)) # The field is left unassigned if the env var is unset
+
+def enqueue_article(db: Session, article_id: int):
+    """
+    Queues an update of an article's search document; if the article no longer exists, its document is deleted instead.
+    Does not commit, so that the task is part of the caller's transaction.
+    """
+    db.add(SearchIndexTask(
+        article_id=article_id,
+    ))
+
+def claim_tasks(db: Session, limit: int) -> list[SearchIndexTask]:
+    """
+    Locks the tasks of up to limit articles that have tasks due, oldest first.
+    All pending tasks of an article are claimed together so they're applied in order.
+    Tasks locked by other workers are skipped.
+    """
+    now = datetime.now(timezone.utc)
+    due_article_ids = select(SearchIndexTask.article_id).where(SearchIndexTask.next_attempt_time <= now).group_by(SearchIndexTask.article_id).order_by(func.min(SearchIndexTask.id)).limit(limit)
+    return db.query(SearchIndexTask).filter(SearchIndexTask.article_id.in_(due_article_ids)).order_by(SearchIndexTask.id).with_for_update(skip_locked=True).all()
+
+def claim_tasks_after(db: Session, task_id: int, limit: int) -> list[SearchIndexTask]:
+    """
+    Locks up to limit of the tasks queued after a task ID, oldest first.
+    """
+    return db.query(SearchIndexTask).filter(SearchIndexTask.id > task_id).order_by(SearchIndexTask.id).limit(limit).with_for_update().all()
+
+def get_last_task_id(db: Session) -> int:
+    """
+    Returns the ID of the latest queued task, or 0 if there are none.
+    """
+    return db.query(func.max(SearchIndexTask.id)).scalar() or 0
+
+def lock_reindexing(db: Session):
+    """
+    Waits for batches of index tasks being applied to finish, and keeps new ones from starting until the transaction ends.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(INDEXING_LOCK_ID)))
+
+def try_lock_task_batch(db: Session) -> bool:
+    """
+    Returns whether a batch of index tasks may be applied, ie. no reindex is in progress.
+    Holds the lock until the transaction ends.
+    """
+    return db.scalar(select(func.pg_try_advisory_xact_lock_shared(INDEXING_LOCK_ID)))
+
+def complete_tasks(db: Session, tasks: list[SearchIndexTask]):
+    """
+    Removes tasks that were applied. Does not commit.
+    """
+    for task in tasks:
+        db.delete(task)
+
+def fail_tasks(db: Session, tasks: list[SearchIndexTask], error: str):
+    """
+    Schedules a retry of tasks with exponential backoff. Does not commit.
+    """
+    now = datetime.now(timezone.utc)
+    for task in tasks:
+        task.attempts += 1
+        task.next_attempt_time = now + timedelta(seconds=get_retry_delay(task.attempts))
+        task.last_error = error[:1000]
+
+def get_retry_delay(attempts: int) -> int:
+    """
+    Returns the seconds to wait before retrying a task that has failed a number of times.
+    """
+    return min(2 ** attempts, CONFIG.SEARCH_INDEX_MAX_BACKOFF)
+
+def get_indexing_status(db: Session) -> SearchIndexingStatus:
+    """
+    Returns how many changes are pending and how long the oldest one has been waiting.
+    """
+    pending, failing, oldest_time = db.query(
+        func.count(SearchIndexTask.id),
+        func.count(SearchIndexTask.id).filter(SearchIndexTask.attempts > 0),
+        func.min(SearchIndexTask.creation_time),
+    ).one()
+    lag = None
+    if oldest_time != None:
+        if oldest_time.tzinfo == None: # Column is stored without timezone
+            oldest_time = oldest_time.replace(tzinfo=timezone.utc)
+        lag = max((datetime.now(timezone.utc) - oldest_time).total_seconds(), 0)
+    return SearchIndexingStatus(
+        pending_tasks=pending,
+        failing_tasks=failing,
+        lag_seconds=lag,
+    )
+
+def update_search_document(db: Session, article: Article):
+    """
+    Creates or updates the full-text search document of an article, from its published content.
+    Does not commit, so that it's part of the caller's transaction.
+    """
+    extracted_text = TextExtraction.get_extracted_text(article.content)
+    authors = " ".join(author.display_name or "" for author in article.authors)
+    vector = create_weighted_vector(article.title, "A") \
+        .op("||", return_type=TSVECTOR)(create_weighted_vector(" ".join(extracted_text.headings) + " " + authors, "B")) \
+        .op("||", return_type=TSVECTOR)(create_weighted_vector(article.summary, "C")) \
+        .op("||", return_type=TSVECTOR)(create_weighted_vector(extracted_text.text, "D"))
+    db.execute(insert(ArticleSearchDocument).values(article_id=article.id, vector=vector).on_conflict_do_update(
+        index_elements=[ArticleSearchDocument.article_id],
+        set_={"vector": vector},
+    ))
+
+def create_weighted_vector(text: str | None, weight: str):
+    """
+    Returns an SQL expression for the lexemes of a text, with a relevance weight (A-D).
+    """
+    return func.setweight(func.to_tsvector(TEXT_SEARCH_CONFIG, text or ""), literal_column(f"'{weight}'"))
+
+def create_missing_search_documents(db: Session) -> int:
+    """
+    Creates the full-text search documents of articles that don't have one, ex. ones created before they were introduced.
+    Returns the amount of documents created.
+    """
+    articles = db.scalars(select(Article).outerjoin(ArticleSearchDocument).where(ArticleSearchDocument.article_id == None).execution_options(yield_per=CONFIG.SEARCH_INDEX_BATCH_SIZE))
+    amount = 0
+    for article in articles:
+        update_search_document(db, article)
+        amount += 1
+    db.commit()
+    return amount
+
+def create_search_statement(text: str | None, tags: list[str] | None, authors: list[str] | None, limit: int) -> Select:
+    """
+    Creates a query for searching articles with the full-text search documents, for when ES is disabled.
+    Mirrors the ES query: articles must match the text as a phrase prefix, any of the tags, or any of the authors,
+    and are ordered by text relevance.
+    """
+    statement = select(Article).outerjoin(ArticleSearchDocument)
+    conditions = []
+    words = QUERY_WORD_REGEX.findall(text or "")
+    if len(words) > 0:
+        query = func.to_tsquery(TEXT_SEARCH_CONFIG, " <-> ".join(words) + ":*") # Last word may be incomplete
+        conditions.append(ArticleSearchDocument.vector.bool_op("@@")(query))
+        statement = statement.order_by(func.ts_rank_cd(ArticleSearchDocument.vector, query).desc().nulls_last())
+    if tags:
+        conditions.append(Article.tags.any(Tag.name.in_(tags)))
+    if authors:
+        conditions.extend(Article.authors.any(Editor.display_name.icontains(author, autoescape=True)) for author in authors)
+    if len(conditions) > 0:
+        statement = statement.where(or_(*conditions))
+    return statement.order_by(Article.id.desc()).limit(limit)
@@ -1,18 +1,129 @@
 """
 CRUD methods for site config tables.
 """
+from itertools import chain
+from sqlalchemy import event, update
 from sqlalchemy.orm import Session
 import crud.utils as CrudUtils
 import crud.file as FileCrud
 import crud.category as CategoryCrud
 import crud.article as ArticleCrud
 from models.site import SiteConfig, SocialNetwork
+from models.category import Category
+from models.article import Article, Tag, article_authors, article_tags
+from models.comment import Comment
+from models.file import File
+from models.user import User, Editor, Credentials
 from schemas.site import *
 from schemas.navigation import *
-from typing import cast
+from typing import Iterable, cast
+import hashlib
 import json
 
 PATCH_FILE_EXCLUDED_FIELDS = set(["navigation", "favicon_path", "logo_path", "social_networks"])
+CONFIG_OUTPUT_MODELS = (SiteConfig, SocialNetwork, Category, Article, Tag, Comment, File, User, Editor, Credentials) # Entities that the config output may include; navigation includes category and article previews.
+
+_cached_config_output: tuple[int, bytes, str] = None # Cache version, rendered output and its ETag.
+
+@event.listens_for(Session, "before_flush")
+def _track_config_output_changes(session: Session, flush_context, instances):
+    """
+    Marks the session's transaction as invalidating cached config outputs if it changes an entity that they include.
+    """
+    if not session.info.get("config_output_changed"):
+        with session.no_autoflush:
+            if changes_configuration_output(session, chain(session.new, session.dirty, session.deleted)):
+                invalidate_configuration_output(session)
+
+@event.listens_for(Session, "before_commit")
+def _bump_config_output_version(session: Session):
+    """
+    Bumps the cache version of config outputs as the last statement of transactions that changed them,
+    so the config row is only locked while committing.
+    """
+    session.flush() # Detect changes that the commit would flush
+    if session.info.pop("config_output_changed", False):
+        session.connection().execute(update(SiteConfig.__table__).values(cache_version=SiteConfig.__table__.c.cache_version + 1))
+
+@event.listens_for(Session, "after_rollback")
+def _forget_config_output_changes(session: Session):
+    """
+    Forgets changes to config outputs that were rolled back.
+    """
+    session.info.pop("config_output_changed", None)
+
+def invalidate_configuration_output(db: Session):
+    """
+    Invalidates cached config outputs in all processes, once the transaction is committed.
+    Only necessary after bulk updates; ORM changes are detected automatically.
+    """
+    db.info["config_output_changed"] = True
+
+def changes_configuration_output(db: Session, changed_objects: Iterable) -> bool:
+    """
+    Returns whether changes to entities would alter the config output.
+    """
+    changed_objects = [obj for obj in changed_objects if isinstance(obj, CONFIG_OUTPUT_MODELS)]
+    if len(changed_objects) == 0:
+        return False
+    if any(isinstance(obj, (SiteConfig, SocialNetwork)) for obj in changed_objects):
+        return True
+
+    references = get_configuration_output_references(db)
+    for obj in changed_objects:
+        if isinstance(obj, Comment):
+            if obj.article_id in references[Article]:
+                return True
+        elif isinstance(obj, Editor):
+            if obj.user_id in references[User]:
+                return True
+        elif obj.id in references[type(obj)]:
+            return True
+    return False
+
+def get_configuration_output_references(db: Session) -> dict[type, set]:
+    """
+    Returns the IDs of the entities that the config output includes, by model.
+    Editors are included as users.
+    """
+    references = {model: set() for model in (Category, Article, Tag, File, User, Credentials)}
+    config = db.query(SiteConfig.navigation, SiteConfig.logo_file_id, SiteConfig.favicon_file_id).first()
+    if not config:
+        return references
+    navigation, logo_file_id, favicon_file_id = config
+
+    # Navigation nodes
+    nodes = list(navigation["root_nodes"]) if navigation else []
+    while len(nodes) > 0:
+        node = nodes.pop()
+        if node["type"] == "group":
+            nodes.extend(node["children"])
+        elif node["type"] == "category":
+            references[Category].add(node["category_id"])
+        elif node["type"] == "article":
+            references[Article].add(node["article_id"])
+
+    # Branding files and their uploaders
+    references[File].update(file_id for file_id in (logo_file_id, favicon_file_id) if file_id != None)
+    if len(references[File]) > 0:
+        references[User].update(user_id for user_id, in db.query(File.uploader_id).filter(File.id.in_(references[File]), File.uploader_id != None))
+
+    # Previews of navigation articles
+    if len(references[Article]) > 0:
+        for category_id, featured_image_id in db.query(Article.category_id, Article.featured_image_id).filter(Article.id.in_(references[Article])):
+            references[Category].add(category_id)
+            if featured_image_id != None:
+                references[File].add(featured_image_id)
+        references[Tag].update(tag_id for tag_id, in db.query(article_tags.c.tag_id).filter(article_tags.c.article_id.in_(references[Article])))
+        author_ids = set(author_id for author_id, in db.query(article_authors.c.author_id).filter(article_authors.c.article_id.in_(references[Article])))
+        references[User].update(author_ids)
+        for avatar_file_id, in db.query(Editor.avatar_file_id).filter(Editor.user_id.in_(author_ids), Editor.avatar_file_id != None):
+            references[File].add(avatar_file_id)
+
+    # Credentials of the included users, for their usernames
+    if len(references[User]) > 0:
+        references[Credentials].update(credentials_id for credentials_id, in db.query(User.credentials_id).filter(User.id.in_(references[User])))
+    return references
 
 def get_config(db: Session) -> SiteConfig:
     """
@@ -150,6 +261,30 @@ def create_configuration_output(db: Session, config: SiteConfig) -> ConfigOutput
         },
     )
 
+def get_rendered_configuration_output(db: Session) -> tuple[bytes, str]:
+    """
+    Returns the site config output rendered as JSON, and its ETag.
+    The output is cached in-process until an entity it may include is changed.
+    """
+    global _cached_config_output
+    version = db.query(SiteConfig.cache_version).scalar()
+    cached = get_cached_configuration_output(version)
+    if cached:
+        return cached
+    body = create_configuration_output(db, get_config(db)).model_dump_json().encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    _cached_config_output = (version, body, etag)
+    return body, etag
+
+def get_cached_configuration_output(version: int) -> tuple[bytes, str] | None:
+    """
+    Returns the cached rendering of the site config output and its ETag, if it's of the given cache version.
+    """
+    cached = _cached_config_output
+    if cached == None or cached[0] != version:
+        return None
+    return cached[1], cached[2]
+
 def create_social_network_output(db: Session, network: SocialNetwork) -> SocialNetworkOutput:
     """
     Creates an output schema for a social network's state.
@@ -165,7 +300,7 @@ def parse_navigation_node(db: Session, node: dict) -> NavigationNode:
         return NavigationNodeGroupOutput(type="group", children=[parse_navigation_node(db, subnode) for subnode in node["children"]], name=node["name"])
     elif node["type"] == "category":
         category = CategoryCrud.get_by_id(db, node["category_id"])
-        return NavigationCategoryOutput(type="category", category=CategoryCrud.create_category_output(db, category, 0))
+        return NavigationCategoryOutput(type="category", category=CategoryCrud.create_category_output(db, category, articles_amount=0, max_depth=0)) # Only the category's own fields are output
     elif node["type"] == "article":
         article = ArticleCrud.get_by_id(db, node["article_id"])
         return NavigationArticleOutput(type="article", article=ArticleCrud.create_article_preview(db, article))
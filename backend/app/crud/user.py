@@ -3,19 +3,71 @@ CRUD methods for Users table.
 """
 from datetime import datetime, timezone
 from typing import Any
-from sqlalchemy.orm import Session
+from itertools import chain
+from sqlalchemy import case, event, inspect, or_
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from models.user import Credentials, Reader, User, Editor, Admin
 from models.file import File
+from models.comment import Comment
 from schemas.user import UserInput, UserUpdate, UserRole, UserOutput, UserLogin, TokenPayload
-from core.security import get_password_hash, verify_password, create_access_token, decode_google_jwt_token
+from core.security import get_password_hash, verify_password, create_access_token, decode_google_jwt_token, invalidate_verified_tokens
 from core.config import CONFIG
+from core.cache import LRUCache
 from fastapi import HTTPException, status
 
+ROLE_LOAD_OPTIONS = (joinedload(User.editor), joinedload(User.admin), joinedload(User.reader)) # Loads the role relationships, which routes check for permissions.
+USER_OUTPUT_CACHE_SIZE = 1024 # Max user outputs cached.
+USER_OUTPUT_CACHE_TTL = 30 # Seconds that user outputs are cached for; bounds how long users changed by other processes stay outdated.
+USER_OUTPUT_MODELS = (User, Credentials, Editor, Admin, Reader) # Models whose changes alter user outputs.
+
+_user_outputs = LRUCache(USER_OUTPUT_CACHE_SIZE) # User outputs by user ID.
+
+@event.listens_for(Session, "before_flush")
+def _track_user_output_changes(session: Session, flush_context, instances):
+    """
+    Records the users and avatar files changed in the session's transaction, whose cached outputs become outdated once it commits.
+    """
+    user_ids, file_paths = session.info.setdefault("changed_user_outputs", (set(), set()))
+    with session.no_autoflush:
+        for obj in chain(session.dirty, session.deleted):
+            if isinstance(obj, USER_OUTPUT_MODELS):
+                user = obj.user if isinstance(obj, Credentials) else obj
+                user_id = user.id if isinstance(user, User) else getattr(user, "user_id", None)
+                if user_id != None:
+                    user_ids.add(user_id)
+            elif isinstance(obj, File): # Avatars are output by path
+                file_paths.update(inspect(obj).attrs.path.history.deleted if obj in session.dirty else [obj.path])
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_user_outputs(session: Session):
+    """
+    Removes the cached outputs of the users changed in a committed transaction from the process.
+    """
+    user_ids, file_paths = session.info.pop("changed_user_outputs", (set(), set()))
+    for user_id in user_ids:
+        invalidate_user_output(user_id)
+    if file_paths:
+        _user_outputs.pop_where(lambda output: output.avatar_file_path in file_paths)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_user_output_changes(session: Session):
+    """
+    Forgets user changes that were rolled back.
+    """
+    session.info.pop("changed_user_outputs", None)
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_session_user_outputs(session: Session, transaction):
+    """
+    Forgets the user outputs created in a session when its transaction ends, as the users may have changed since.
+    """
+    session.info.pop("user_outputs", None)
+
 def create_admin(db: Session, username: str, password: str) -> Admin:
     """
     Creates an admin account.
     """
-    user = User()
+    user = User(role=UserRole.admin)
     credentials = try_create_credentials(db, user)
     credentials.username = username
     credentials.hashed_password = get_password_hash(password)
@@ -61,12 +113,14 @@ def create_editor(db: Session, user_input: UserInput) -> User:
     if existing_user_by_username:
         raise ValueError("An account with that username already exists")
 
+    hashed_password = get_password_hash(user_input.password) # Outside the try block, so hashing being busy isn't reported as a DB error
+
     # Create user
     try:
-        user = User()
+        user = User(role=UserRole.editor)
         credentials = try_create_credentials(db, user)
-        credentials.username = user_input.username,
-        credentials.hashed_password = get_password_hash(user_input.password),
+        credentials.username = user_input.username
+        credentials.hashed_password = hashed_password
         db.add(user)
 
         # Create corresponding editor table entry
@@ -93,7 +147,7 @@ def create_reader(db: Session, oauth_id: str) -> User:
     """
     # Create user
     try:
-        user = User()
+        user = User(role=UserRole.reader)
         credentials = try_create_credentials(db, user)
         credentials.oauth_id = oauth_id
         db.add(user)
@@ -146,15 +200,18 @@ def update_user(db: Session, user: User, user_update: UserUpdate) -> User:
         user.editor.contact_email = update_dict["contact_email"]
     
     # Update username
+    credentials_changed = False # Tokens are bound to the username, and are invalidated by password changes
     if user_update.username and user_update.username != user.credentials.username:
         if not username_is_taken(db, user_update.username):
             user.credentials.username = user_update.username
+            credentials_changed = True
         else:
             raise ValueError("Username is already taken")
     
     # Update password
     if user_update.password:
         user.credentials.hashed_password = get_password_hash(user_update.password)
+        credentials_changed = True
 
     # Update avatar
     if user_update.avatar_file_path and role == UserRole.editor:
@@ -167,6 +224,8 @@ def update_user(db: Session, user: User, user_update: UserUpdate) -> User:
     db.commit()
     db.refresh(user)
     db.refresh(user.credentials)
+    if credentials_changed:
+        invalidate_verified_tokens(user.id)
 
     return user
 
@@ -174,17 +233,11 @@ def get_all(db: Session, roles: set[UserRole]|None) -> list[User]:
     """
     Returns all user accounts, optionally filtered by role.
     """
-    users = db.query(User).all()
-    valid_users = users
-
-    # Filter by role
+    # Load what create_user_output() needs in the same query
+    query = db.query(User).options(joinedload(User.credentials), joinedload(User.editor).joinedload(Editor.avatar).load_only(File.path))
     if roles:
-        valid_users = []
-        for user in users:
-            if get_role(user) in roles:
-                valid_users.append(user)
-
-    return valid_users
+        query = query.filter(User.role.in_(roles))
+    return query.order_by(User.id).all()
 
 def delete_user(db: Session, user: User):
     """
@@ -195,8 +248,18 @@ def delete_user(db: Session, user: User):
         raise ValueError("Cannot delete the only admin account")
 
     # TODO first check the user has no articles they are the sole author of, once articles are implemented
+    user_id = user.id
+    commented_article_ids = [article_id for (article_id,) in db.query(Comment.article_id).filter(Comment.user_id == user_id).distinct()]
     db.delete(user)
+    db.flush()
+
+    # Recount the comments of the articles the user commented on, as deleting their comments also deletes the replies to them
+    if commented_article_ids:
+        import crud.comment as CommentCrud # crud.comment imports this module, through crud.file
+        CommentCrud.recount_article_comments(db, commented_article_ids)
+
     db.commit()
+    invalidate_verified_tokens(user_id)
 
 def authenticate(db: Session, login_input: UserLogin) -> tuple[User, str]:
     """
@@ -211,8 +274,11 @@ def authenticate(db: Session, login_input: UserLogin) -> tuple[User, str]:
     except ValueError as e:
         raise ValueError("Invalid credentials")
 
-    if not user or not verify_password(login_input.password, user.credentials.hashed_password):
+    password_matches, new_hash = verify_password(login_input.password, user.credentials.hashed_password)
+    if not password_matches:
         raise ValueError("Invalid credentials")
+    if new_hash: # Upgrade hashes created with a previous cost factor
+        user.credentials.hashed_password = new_hash
     
     # Create token and associate it to the user
     token = create_access_token(get_username(user))
@@ -226,10 +292,38 @@ def deauthenticate(db: Session, user: User):
     """
     user.credentials.token_valid_from = datetime.now(timezone.utc) # Invalidate all tokens issued before
     db.commit()
+    invalidate_verified_tokens(user.id)
 
 def create_user_output(user: User) -> UserOutput:
     """
-    Creates a UserOutput response for a user.
+    Returns a UserOutput response for a user.
+    Outputs are reused within a session's transaction and cached in-process until the user changes;
+    they are shared, and must not be modified.
+    """
+    db = Session.object_session(user)
+    if db == None or user.id == None: # Not persisted yet
+        return build_user_output(user)
+
+    outputs = db.info.setdefault("user_outputs", {})
+    output = outputs.get(user.id)
+    if output == None:
+        output = _user_outputs.get(user.id)
+    if output == None:
+        output = build_user_output(user)
+        _user_outputs.put(user.id, output, USER_OUTPUT_CACHE_TTL)
+    outputs[user.id] = output
+    return output
+
+def invalidate_user_output(user_id: int):
+    """
+    Removes the cached output of a user in the current process.
+    Other processes stop using theirs after USER_OUTPUT_CACHE_TTL.
+    """
+    _user_outputs.pop(user_id)
+
+def build_user_output(user: User) -> UserOutput:
+    """
+    Builds a UserOutput response for a user, without caching.
     """
     role = get_role(user)
 
@@ -250,12 +344,19 @@ def create_user_output(user: User) -> UserOutput:
 
 def get_by_username(db: Session, username: str) -> User:
     """
-    Returns a user account by their username.
+    Returns a user account by their username, or their oauth ID for readers.
+    The user's credentials and role are loaded in the same query.
     """
-    credentials = db.query(Credentials).filter(Credentials.username == username).first() or db.query(Credentials).filter(Credentials.oauth_id == username).first()
-    if not credentials:
+    user = db.query(User).join(User.credentials).filter(or_(Credentials.username == username, Credentials.oauth_id == username)).options(contains_eager(User.credentials), *ROLE_LOAD_OPTIONS).order_by(case((Credentials.username == username, 0), else_=1)).first() # Prefer username matches; readers' usernames are NULL, which a plain comparison would sort first
+    if not user:
         raise ValueError("User not found")
-    return credentials.user
+    return user
+
+def get_by_id(db: Session, id: int) -> User | None:
+    """
+    Returns a user by their ID, with their credentials and role loaded in the same query.
+    """
+    return db.get(User, id, options=(joinedload(User.credentials), *ROLE_LOAD_OPTIONS))
 
 def get_by_oauth(db: Session, oauth_id: str) -> User:
     """
@@ -288,11 +389,7 @@ def get_editor(db: Session, username: str) -> Editor | None:
 
 def get_role(user: User) -> UserRole:
     """Returns a user's role."""
-    if user.editor:
-        return UserRole.editor
-    elif user.admin:
-        return UserRole.admin
-    elif user.reader:
-        return UserRole.reader
+    if user.role:
+        return user.role
     
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User has no role")
\ No newline at end of file
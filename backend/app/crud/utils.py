@@ -1,8 +1,11 @@
-from collections import defaultdict
+from sqlalchemy import ColumnElement, and_, or_
 from sqlalchemy.orm import Session, InstanceState
 from sqlalchemy.inspection import inspect
 from pydantic import BaseModel
-from typing import TypeVar
+from typing import Any, TypeVar
+from datetime import datetime
+import base64
+import json
 
 T = TypeVar("T")
 
@@ -40,18 +43,34 @@ def concatenate_path(*components: str) -> str:
         path = path[1:]
     return path
 
-def nested_dict():
+def encode_cursor(*values: Any) -> str:
     """
-    Creates a default dictionary where each value is an other default dictionary.
-    Source: https://stackoverflow.com/a/58917078
+    Encodes the sort keys of the last item of a page into an opaque cursor for fetching the next page.
     """
-    return defaultdict(nested_dict)
+    values = [{"datetime": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
 
-def default_to_regular(d):
+def decode_cursor(cursor: str, *types: type) -> list:
     """
-    Converts defaultdicts of defaultdicts to dict of dicts.
-    Source: https://stackoverflow.com/a/58917078
+    Decodes the sort keys of a cursor, checking that each is None or of the corresponding type.
     """
-    if isinstance(d, defaultdict):
-        d = {k: default_to_regular(v) for k, v in d.items()}
-    return d
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = [datetime.fromisoformat(value["datetime"]) if isinstance(value, dict) else value for value in values]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if len(values) != len(types) or any(value != None and not isinstance(value, value_type) for value, value_type in zip(values, types)):
+        raise ValueError("Invalid cursor")
+    return values
+
+def create_keyset_filter(column: ColumnElement, id_column: ColumnElement, value: Any, last_id: int, descending: bool=False) -> ColumnElement:
+    """
+    Creates a filter for the rows that come after (value, last_id) when sorting by column and then id_column.
+    Nulls are expected to sort as in Postgres: last in ascending order, first in descending order.
+    """
+    id_filter = id_column < last_id if descending else id_column > last_id
+    if value == None:
+        return or_(and_(column == None, id_filter), column != None) if descending else and_(column == None, id_filter)
+    if descending:
+        return or_(column < value, and_(column == value, id_filter))
+    return or_(column > value, and_(column == value, id_filter), column == None)
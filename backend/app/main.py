@@ -2,16 +2,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from core.lifespan import lifespan
-from core.config import engine
-from core.config import Base, CONFIG
+from core.config import CONFIG
 from routes import user, category, article, file, search, site, comment
 
-# Importing models will have SQLAlchemy recognize them for creation & migration
+# Importing models will have SQLAlchemy resolve their relationships; tables are created and migrated by Alembic (see migrations/)
 from models.user import *
 from models.category import *
 from models.article import *
 from models.file import *
 from models.site import *
+from models.search import *
 
 # Initialize app
 app = FastAPI(
@@ -30,9 +30,6 @@ app.add_middleware(
     allow_headers=["*"], # Allows all headers
 )
 
-# Create or migrate database tables on startup
-Base.metadata.create_all(bind=engine)
-
 # Define routes
 app.include_router(user.router, prefix="/users", tags=["Users"])
 app.include_router(category.router, prefix="/categories", tags=["Categories"])
@@ -0,0 +1,51 @@
+"""
+    Alembic environment; runs migrations with the app's DB engine.
+"""
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import text
+from core.config import Base
+import core.config as Config
+
+# Importing models will have SQLAlchemy recognize them for autogenerating migrations
+from models.user import *
+from models.category import *
+from models.article import *
+from models.comment import *
+from models.file import *
+from models.site import *
+from models.search import *
+
+MIGRATION_LOCK_ID = 4_271_835 # Arbitrary key of the advisory lock held while migrating
+
+if context.config.config_file_name != None:
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+def run_migrations_offline():
+    """
+    Emits the migrations as SQL to the output, without connecting to the DB.
+    """
+    context.configure(url=Config.URL_DATABASE, target_metadata=Base.metadata, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """
+    Runs the migrations on the DB.
+    Concurrent runs (ex. from multiple app containers starting at once) wait for each other, and skip the migrations already applied.
+    """
+    with Config.engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            context.configure(connection=connection, target_metadata=Base.metadata)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
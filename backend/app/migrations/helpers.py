@@ -0,0 +1,32 @@
+"""
+    Operations shared by migrations.
+"""
+from alembic import context, op
+from sqlalchemy import text
+
+def is_index_valid(name: str) -> bool | None:
+    """
+    Returns whether an index was built successfully, or None if it does not exist.
+    """
+    return op.get_bind().execute(text("SELECT indisvalid FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid WHERE pg_class.relname = :name"), {"name": name}).scalar()
+
+def create_index_concurrently(name: str, table: str, columns: list[str], **kwargs):
+    """
+    Creates an index without blocking writes to the table while it's built, for rolling out indexes on large tables.
+    Concurrent builds cannot run in a transaction, so the migration's transaction is committed first.
+    The index is skipped if it was already built by a previous failed run of the migration, and rebuilt if that run left it invalid.
+    """
+    valid = is_index_valid(name) if not context.is_offline_mode() else None
+    if valid:
+        return
+    with op.get_context().autocommit_block():
+        if valid == False:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+
+def drop_index_concurrently(name: str, table: str):
+    """
+    Drops an index without blocking reads and writes to the table.
+    """
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,205 @@
+"""Baseline schema, as created by the app before migrations were introduced.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 17:44:22.643130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('directory_name', sa.String(), nullable=True),
+    sa.Column('cached_url', sa.String(), nullable=True),
+    sa.Column('view_type', sa.Enum('vertical', 'grid', name='categoryviewenum'), nullable=True),
+    sa.Column('sorting_type', sa.Enum('chronological', 'manual', name='categorysortingmodeenum'), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['categories.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_categories_cached_url'), 'categories', ['cached_url'], unique=False)
+    op.create_index(op.f('ix_categories_id'), 'categories', ['id'], unique=True)
+    op.create_table('credentials',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('token_valid_from', sa.DateTime(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('oauth_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_credentials_id'), 'credentials', ['id'], unique=False)
+    op.create_index(op.f('ix_credentials_username'), 'credentials', ['username'], unique=True)
+    op.create_table('socialnetworks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('can_share', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_socialnetworks_id'), 'socialnetworks', ['id'], unique=False)
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tags_id'), 'tags', ['id'], unique=True)
+    op.create_index(op.f('ix_tags_name'), 'tags', ['name'], unique=True)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('credentials_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['credentials_id'], ['credentials.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('admins',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_table('files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(), nullable=True),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.Column('uploader_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['uploader_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_files_id'), 'files', ['id'], unique=True)
+    op.create_index(op.f('ix_files_path'), 'files', ['path'], unique=True)
+    op.create_table('readers',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_table('articles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('featured_image_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.Column('draft_content', sa.LargeBinary(), nullable=True),
+    sa.Column('creation_time', sa.DateTime(), nullable=True),
+    sa.Column('last_edit_time', sa.DateTime(), nullable=True),
+    sa.Column('publish_time', sa.DateTime(), nullable=True),
+    sa.Column('show_publish_time', sa.Boolean(), nullable=True),
+    sa.Column('is_visible', sa.Boolean(), nullable=True),
+    sa.Column('view_type', sa.Enum('single_page', 'by_sections', name='articleviewenum'), nullable=True),
+    sa.Column('can_comment', sa.Boolean(), nullable=True),
+    sa.Column('show_authors', sa.Boolean(), nullable=True),
+    sa.Column('category_sorting_index', sa.Integer(), nullable=True),
+    sa.Column('summary', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['featured_image_id'], ['files.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_articles_id'), 'articles', ['id'], unique=True)
+    op.create_table('config',
+    sa.Column('lock', sa.Integer(), nullable=False),
+    sa.Column('site_name', sa.String(), nullable=True),
+    sa.Column('theme', sa.String(), nullable=True),
+    sa.Column('logo_file_id', sa.Integer(), nullable=True),
+    sa.Column('favicon_file_id', sa.Integer(), nullable=True),
+    sa.Column('navigation', sa.JSON(), nullable=True),
+    sa.Column('sidebar_document', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['favicon_file_id'], ['files.id'], ),
+    sa.ForeignKeyConstraint(['logo_file_id'], ['files.id'], ),
+    sa.PrimaryKeyConstraint('lock')
+    )
+    op.create_index(op.f('ix_config_lock'), 'config', ['lock'], unique=True)
+    op.create_table('editors',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('avatar_file_id', sa.Integer(), nullable=True),
+    sa.Column('display_name', sa.String(), nullable=True),
+    sa.Column('contact_email', sa.String(), nullable=True),
+    sa.Column('biography', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['avatar_file_id'], ['files.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], onupdate='CASCADE', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_table('article_annotations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('comment', sa.String(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('start', sa.Integer(), nullable=False),
+    sa.Column('end', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.ForeignKeyConstraint(['author_id'], ['editors.user_id'], ),
+    sa.PrimaryKeyConstraint('id', 'article_id')
+    )
+    op.create_index(op.f('ix_article_annotations_id'), 'article_annotations', ['id'], unique=True)
+    op.create_table('article_authors',
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('author_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.ForeignKeyConstraint(['author_id'], ['editors.user_id'], )
+    )
+    op.create_table('article_tags',
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('tag_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], )
+    )
+    op.create_table('comments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('post_time', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('parent_comment_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.ForeignKeyConstraint(['parent_comment_id'], ['comments.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_comments_id'), 'comments', ['id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_comments_id'), table_name='comments')
+    op.drop_table('comments')
+    op.drop_table('article_tags')
+    op.drop_table('article_authors')
+    op.drop_index(op.f('ix_article_annotations_id'), table_name='article_annotations')
+    op.drop_table('article_annotations')
+    op.drop_table('editors')
+    op.drop_index(op.f('ix_config_lock'), table_name='config')
+    op.drop_table('config')
+    op.drop_index(op.f('ix_articles_id'), table_name='articles')
+    op.drop_table('articles')
+    op.drop_table('readers')
+    op.drop_index(op.f('ix_files_path'), table_name='files')
+    op.drop_index(op.f('ix_files_id'), table_name='files')
+    op.drop_table('files')
+    op.drop_table('admins')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_tags_name'), table_name='tags')
+    op.drop_index(op.f('ix_tags_id'), table_name='tags')
+    op.drop_table('tags')
+    op.drop_index(op.f('ix_socialnetworks_id'), table_name='socialnetworks')
+    op.drop_table('socialnetworks')
+    op.drop_index(op.f('ix_credentials_username'), table_name='credentials')
+    op.drop_index(op.f('ix_credentials_id'), table_name='credentials')
+    op.drop_table('credentials')
+    op.drop_index(op.f('ix_categories_id'), table_name='categories')
+    op.drop_index(op.f('ix_categories_cached_url'), table_name='categories')
+    op.drop_table('categories')
+    for enum_name in ('articleviewenum', 'categoryviewenum', 'categorysortingmodeenum'):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
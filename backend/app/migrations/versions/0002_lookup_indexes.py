@@ -0,0 +1,65 @@
+"""Primary keys for the article association tables, and indexes for lookups by foreign keys and article listings.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 17:46:02.312457
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from migrations.helpers import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ASSOCIATION_TABLES = (
+    ('article_authors', 'author_id'),
+    ('article_tags', 'tag_id'),
+)
+
+
+def has_primary_key(table: str) -> bool:
+    return op.get_bind().execute(sa.text("SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"), {'table': table}).first() != None
+
+
+def upgrade() -> None:
+    # Association tables had no constraints, so they may contain duplicate or incomplete rows
+    for table, column in ASSOCIATION_TABLES:
+        if not context.is_offline_mode() and has_primary_key(table): # Added by a previous failed run
+            continue
+        op.execute(f'DELETE FROM {table} WHERE article_id IS NULL OR {column} IS NULL')
+        op.execute(f'DELETE FROM {table} a USING {table} b WHERE a.ctid < b.ctid AND a.article_id = b.article_id AND a.{column} = b.{column}')
+        # Build the key's index first, so the table is only locked while the key is attached to it
+        create_index_concurrently(f'{table}_pkey', table, ['article_id', column], unique=True)
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_pkey')
+    create_index_concurrently('article_authors_author_index', 'article_authors', ['author_id'])
+    create_index_concurrently('article_tags_tag_index', 'article_tags', ['tag_id'])
+
+    create_index_concurrently('article_category_listing_index', 'articles', ['category_id', 'is_visible', 'publish_time'])
+    create_index_concurrently('article_latest_index', 'articles', ['is_visible', 'publish_time'])
+    create_index_concurrently(op.f('ix_categories_parent_id'), 'categories', ['parent_id'])
+    create_index_concurrently('comment_article_index', 'comments', ['article_id', 'post_time'])
+    create_index_concurrently('comment_parent_index', 'comments', ['parent_comment_id'])
+    create_index_concurrently(op.f('ix_credentials_oauth_id'), 'credentials', ['oauth_id'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently(op.f('ix_credentials_oauth_id'), 'credentials')
+    drop_index_concurrently('comment_parent_index', 'comments')
+    drop_index_concurrently('comment_article_index', 'comments')
+    drop_index_concurrently(op.f('ix_categories_parent_id'), 'categories')
+    drop_index_concurrently('article_latest_index', 'articles')
+    drop_index_concurrently('article_category_listing_index', 'articles')
+
+    drop_index_concurrently('article_tags_tag_index', 'article_tags')
+    drop_index_concurrently('article_authors_author_index', 'article_authors')
+    for table, column in ASSOCIATION_TABLES:
+        op.drop_constraint(f'{table}_pkey', table, type_='primary')
+        op.alter_column(table, 'article_id', existing_type=sa.Integer(), nullable=True)
+        op.alter_column(table, column, existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,38 @@
+"""Role column for users, backfilled from their role tables.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 21:12:40.518214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Role tables, from lowest to highest precedence when a user has multiple roles
+ROLE_TABLES = (
+    ('reader', 'readers'),
+    ('admin', 'admins'),
+    ('editor', 'editors'),
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE TYPE userrole AS ENUM ('admin', 'editor', 'reader')")
+    op.add_column('users', sa.Column('role', postgresql.ENUM('admin', 'editor', 'reader', name='userrole', create_type=False), nullable=True))
+    for role, table in ROLE_TABLES:
+        op.execute(f"UPDATE users SET role = '{role}' FROM {table} WHERE {table}.user_id = users.id")
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'role')
+    op.execute('DROP TYPE userrole')
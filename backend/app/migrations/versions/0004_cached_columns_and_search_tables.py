@@ -0,0 +1,87 @@
+"""Cached columns, file metadata and search tables added since the baseline, with backfills of the cached columns.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:05:31.884102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Cached breadcrumbs of categories: names of the categories along their path, from the root ("/") down
+    op.add_column('categories', sa.Column('cached_breadcrumbs', sa.JSON(), nullable=True))
+    op.execute("""
+        WITH RECURSIVE breadcrumbs(id, names) AS (
+            SELECT id, jsonb_build_array('/') FROM categories WHERE parent_id IS NULL
+            UNION ALL
+            SELECT categories.id, breadcrumbs.names || to_jsonb(categories.name) FROM categories JOIN breadcrumbs ON categories.parent_id = breadcrumbs.id
+        )
+        UPDATE categories SET cached_breadcrumbs = CAST(breadcrumbs.names AS json) FROM breadcrumbs WHERE categories.id = breadcrumbs.id
+    """)
+
+    # Comment counts of articles, including replies
+    op.add_column('articles', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute('UPDATE articles SET comments_count = counts.count FROM (SELECT article_id, COUNT(*) AS count FROM comments GROUP BY article_id) AS counts WHERE articles.id = counts.article_id')
+
+    # Cache version of the site config output; the server default backfills the config row
+    op.add_column('config', sa.Column('cache_version', sa.Integer(), server_default='0', nullable=False))
+
+    # File storage and metadata; the metadata of existing files is filled in by the app when they are next read
+    op.add_column('files', sa.Column('storage_path', sa.String(), nullable=True))
+    op.add_column('files', sa.Column('content_hash', sa.String(), nullable=True))
+    op.add_column('files', sa.Column('size', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('mime_type', sa.String(), nullable=True))
+    op.add_column('files', sa.Column('last_modified', sa.DateTime(), nullable=True))
+
+    # Queue of search index changes
+    op.create_table('search_index_tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('creation_time', sa.DateTime(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_time', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_search_index_tasks_article_id'), 'search_index_tasks', ['article_id'], unique=False)
+    op.create_index(op.f('ix_search_index_tasks_id'), 'search_index_tasks', ['id'], unique=True)
+    op.create_index(op.f('ix_search_index_tasks_next_attempt_time'), 'search_index_tasks', ['next_attempt_time'], unique=False)
+
+    # Full-text search documents; the app creates them for existing articles on startup
+    op.create_table('article_search_documents',
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('vector', postgresql.TSVECTOR(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('article_id')
+    )
+    op.create_index('article_search_vector_index', 'article_search_documents', ['vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('article_search_vector_index', table_name='article_search_documents', postgresql_using='gin')
+    op.drop_table('article_search_documents')
+    op.drop_index(op.f('ix_search_index_tasks_next_attempt_time'), table_name='search_index_tasks')
+    op.drop_index(op.f('ix_search_index_tasks_id'), table_name='search_index_tasks')
+    op.drop_index(op.f('ix_search_index_tasks_article_id'), table_name='search_index_tasks')
+    op.drop_table('search_index_tasks')
+
+    op.drop_column('files', 'last_modified')
+    op.drop_column('files', 'mime_type')
+    op.drop_column('files', 'size')
+    op.drop_column('files', 'content_hash')
+    op.drop_column('files', 'storage_path')
+    op.drop_column('config', 'cache_version')
+    op.drop_column('articles', 'comments_count')
+    op.drop_column('categories', 'cached_breadcrumbs')
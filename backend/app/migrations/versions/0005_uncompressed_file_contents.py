@@ -0,0 +1,28 @@
+"""Store file contents in the database uncompressed.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:48:12.305917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Compressed values have to be decompressed whole to read any range of them, which makes streaming them in chunks quadratic
+    op.execute('ALTER TABLE files ALTER COLUMN content SET STORAGE EXTERNAL')
+    # The storage only applies to values as they are written; rewrite existing contents (concatenating forces a new value)
+    op.execute("UPDATE files SET content = content || ''::bytea WHERE content IS NOT NULL")
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE files ALTER COLUMN content SET STORAGE EXTENDED')
@@ -19,18 +19,21 @@ class ArticleViewEnum(str, enum.Enum): # TODO move to schema?
 
 # Auxiliary table for N-N Article-Editor relationship.
 # Cascade is set within the relationship of the involved tables.
+# The primary keys index lookups by article; the extra indexes serve reverse lookups.
 article_authors = Table(
     "article_authors",
     Base.metadata,
-    Column("article_id", ForeignKey("articles.id")),
-    Column("author_id", ForeignKey("editors.user_id")),
+    Column("article_id", ForeignKey("articles.id"), primary_key=True),
+    Column("author_id", ForeignKey("editors.user_id"), primary_key=True),
+    Index("article_authors_author_index", "author_id"),
 )
 
 article_tags = Table(
     "article_tags",
     Base.metadata,
-    Column("article_id", ForeignKey("articles.id")),
-    Column("tag_id", ForeignKey("tags.id")),
+    Column("article_id", ForeignKey("articles.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tags.id"), primary_key=True),
+    Index("article_tags_tag_index", "tag_id"),
 )
 
 class Tag(Base):
@@ -83,9 +86,17 @@ class Article(Base):
     category_sorting_index = Column(Integer, default=0)
     summary = Column(String)
 
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
+    """Amount of comments on the article, including replies. Kept in sync by the comment CRUD methods."""
+
     category: Mapped["Category"] = relationship("Category", back_populates="articles")
     authors: Mapped[list["Editor"]] = relationship(secondary="article_authors", cascade="all", back_populates="articles")
     comments: Mapped[list["Comment"]] = relationship("Comment", order_by="Comment.post_time", cascade="delete, delete-orphan", back_populates="article") # Delete comments when the article is deleted
     tags: Mapped[list["Tag"]] = relationship(secondary="article_tags", cascade="all", back_populates="articles")
     featured_image: Mapped["File"] = relationship("File")
     annotations: Mapped[list["ArticleAnnotation"]] = relationship("ArticleAnnotation", back_populates="article", cascade="all, delete-orphan") # Delete annotations when the article is deleted
+
+    __table_args__ = (
+        Index("article_category_listing_index", "category_id", "is_visible", "publish_time"), # Category article listings; also serves lookups by category
+        Index("article_latest_index", "is_visible", "publish_time"), # Latest articles of the site
+    )
@@ -2,7 +2,7 @@
 """
     Category-related tables.
 """
-from sqlalchemy import Column, Index, String, ForeignKey, Integer, Enum
+from sqlalchemy import JSON, Column, Index, String, ForeignKey, Integer, Enum
 from sqlalchemy.orm import relationship, Mapped
 from core.config import Base
 import typing
@@ -22,11 +22,12 @@ class Category(Base):
     __tablename__ = "categories"
 
     id = Column(Integer, index=True, primary_key=True, unique=True)
-    parent_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=True) # Self-referential relationship
+    parent_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=True, index=True) # Self-referential relationship
     name = Column(String)
     description = Column(String, default="")
     directory_name = Column(String)
     cached_url = Column(String, nullable=True, index=Index("category_url_index", postgresql_using="hash")) # Cached full path to the category
+    cached_breadcrumbs = Column(JSON, nullable=True) # Cached names of the categories along the path, from root to this one
     view_type = Column(Enum(CategoryViewEnum), default=CategoryViewEnum.vertical)
     sorting_type = Column(Enum(CategorySortingModeEnum), default=CategorySortingModeEnum.chronological)
     
@@ -3,7 +3,7 @@ Tables for article comments.
 """
 from datetime import datetime, timezone
 import typing
-from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, ForeignKey, Text
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, ForeignKey, Text
 from sqlalchemy.orm import relationship, Mapped
 from models.article import Article
 from core.config import Base
@@ -28,3 +28,8 @@ class Comment(Base):
     article: Mapped["Article"] = relationship("Article", back_populates="comments")
     parent_comment: Mapped["Comment"] = relationship("Comment", back_populates="replies", remote_side=[id])
     replies: Mapped[list["Comment"]] = relationship("Comment", back_populates="parent_comment", cascade="delete, delete-orphan", order_by=post_time)
+
+    __table_args__ = (
+        Index("comment_article_index", "article_id", "post_time"), # Comments of an article, in posting order
+        Index("comment_parent_index", "parent_comment_id"),
+    )
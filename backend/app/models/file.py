@@ -2,8 +2,9 @@
 Tables for file management.
 """
 import typing
-from sqlalchemy import Column, Integer, LargeBinary, String, ForeignKey
-from sqlalchemy.orm import relationship, Mapped
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, ForeignKey
+from sqlalchemy.orm import relationship, Mapped, deferred
 from models.article import Article
 from core.config import Base
 if typing.TYPE_CHECKING:
@@ -17,7 +18,19 @@ class File(Base):
 
     id = Column(Integer, index=True, primary_key=True, unique=True)
     path = Column(String, index=True, unique=True)
-    content = Column(LargeBinary)
+    content = deferred(Column(LargeBinary)) # Only loaded when accessed, as most uses only need metadata. Null for files in the local store.
+    storage_path = Column(String, nullable=True)
+    """Path of the content within the local file store, relative to its root. Null for files stored in the DB."""
     uploader_id = Column(Integer, ForeignKey("users.id"))
 
+    content_hash = Column(String, nullable=True)
+    """SHA-256 hex digest of the content. Used as ETag."""
+
+    size = Column(Integer, nullable=True)
+    """Size of the content, in bytes."""
+
+    mime_type = Column(String, nullable=True)
+    last_modified = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    """Time the content was last replaced."""
+
     uploader: Mapped["User"] = relationship("User", back_populates="uploaded_files")
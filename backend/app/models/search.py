@@ -0,0 +1,38 @@
+"""
+    Tables related to the search indices.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from core.config import Base
+from datetime import datetime, timezone
+
+class SearchIndexTask(Base):
+    """
+    Pending change to the search document of an article.
+    Written in the same transaction as the change itself and deleted once ES has applied it,
+    so that changes are not lost if ES is unavailable or the app restarts.
+    """
+    __tablename__ = "search_index_tasks"
+
+    id = Column(Integer, index=True, primary_key=True, unique=True)
+    article_id = Column(Integer, index=True, nullable=False)
+    """Not a foreign key, as tasks must outlive deleted articles to remove their documents."""
+
+    creation_time = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_time = Column(DateTime, index=True, nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = Column(String, nullable=True)
+
+class ArticleSearchDocument(Base):
+    """
+    Full-text search document of an article, used for searching when ES is disabled.
+    Kept in its own table so article queries don't load it.
+    """
+    __tablename__ = "article_search_documents"
+    __table_args__ = (
+        Index("article_search_vector_index", "vector", postgresql_using="gin"),
+    )
+
+    article_id = Column(Integer, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True)
+    vector = Column(TSVECTOR, nullable=False)
+    """Weighted lexemes of the article's title, headings and authors, summary and content, in order of relevance."""
@@ -24,6 +24,8 @@ class SiteConfig(Base):
     favicon_file_id = Column(Integer, ForeignKey("files.id"), nullable=True)
     navigation = Column(JSON)
     sidebar_document = Column(String, nullable=True)
+    cache_version = Column(Integer, nullable=False, default=0, server_default="0")
+    """Incremented whenever an entity that the config output may include is changed; see crud.site."""
 
     # Relations
     logo: Mapped["File"] = relationship("File", foreign_keys=[logo_file_id])
@@ -2,9 +2,10 @@
     User-related tables.
 """
 from datetime import datetime, timezone
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey
+from sqlalchemy import Column, DateTime, Enum, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship, Mapped
 from models.article import Article
+from schemas.user import UserRole
 from core.config import Base
 import typing
 if typing.TYPE_CHECKING:
@@ -21,7 +22,7 @@ class Credentials(Base):
     """Date past which JWT tokens are valid. Used to invalidate old tokens."""
 
     hashed_password = Column(String, nullable=True)
-    oauth_id = Column(String, nullable=True)
+    oauth_id = Column(String, nullable=True, index=True)
     # TODO 2fa
 
     # Relations
@@ -33,6 +34,8 @@ class User(Base):
 
     id = Column(Integer, index=True, primary_key=True)
     credentials_id = Column(Integer, ForeignKey('credentials.id', ondelete="CASCADE"))
+    role = Column(Enum(UserRole), nullable=True)
+    """Which of the editor, admin or reader relations the user has; stored to not need to load all of them."""
 
     # Relations
     credentials: Mapped["Credentials"] = relationship("Credentials", back_populates="user")
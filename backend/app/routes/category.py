@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.config import get_db
+from core.config import get_async_db, get_db
 import schemas.category as CategorySchemas
 from core.utils import get_current_user, get_current_user_optional
 from models.user import User
 import crud.category as CategoryCrud
+import crud.aio.category as CategoryAioCrud
 
 router = APIRouter()
 
@@ -25,13 +27,15 @@ async def create_category(category_input: CategorySchemas.CategoryInput, db: Ses
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{category_path:path}", response_model=CategorySchemas.CategoryOutput)
-async def get_category(category_path: str, published_only: bool=True, articles_amount: int = 5, articles_skip: int = 0, db: Session=Depends(get_db)):
+async def get_category(category_path: str, published_only: bool=True, articles_amount: int = 5, articles_skip: int = 0, depth: int = None, subcategory_articles_amount: int = None, articles_cursor: str = None, db: AsyncSession=Depends(get_async_db)):
     """
     Fetches a category by its full URL path.
+    depth limits the levels of subcategories returned, and subcategory_articles_amount the articles returned for each of them.
+    Pages of articles after the first should be fetched by passing the articles_next_cursor of the previous page.
     """
     try:
-        category = CategoryCrud.get_category_by_path(db, "/" + category_path)
-        return CategoryCrud.create_category_output(db, category, published_only, articles_amount, articles_skip)
+        category = await CategoryAioCrud.get_category_by_path(db, "/" + category_path)
+        return await CategoryAioCrud.create_category_output(db, category, published_only, articles_amount, articles_skip, depth, subcategory_articles_amount, articles_cursor)
     except ValueError as e:
         msg = str(e)
         if "at this path" in msg: # Category not found, but path format is valid
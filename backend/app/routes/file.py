@@ -1,32 +1,182 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from starlette.datastructures import UploadFile
 from core.config import get_db
+from core.storage import LOCAL_STORAGE
 from core.utils import get_current_user, get_current_user_optional
 from models.user import User
+from models.file import File
 import schemas.file as FileSchemas
 import crud.file as FileCrud
+import core.images as Images
+import asyncio
+import re
 
 router = APIRouter()
 
-@router.post("/", response_model=FileSchemas.FileOutput)
-async def upload_file(file_input: FileSchemas.FileInput, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
+RANGE_HEADER_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$") # Single byte range; multiple ranges are not supported.
+UPLOAD_OPENAPI_EXTRA = { # Documents the request bodies accepted by upload routes, as they're parsed manually.
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": FileSchemas.FileInput.model_json_schema()},
+            "multipart/form-data": {"schema": {
+                "type": "object",
+                "properties": {"path": {"type": "string"}, "file": {"type": "string", "format": "binary"}},
+                "required": ["file"],
+            }},
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+}
+
+def create_file_response(request: Request, db: Session, file: File) -> Response:
+    """
+    Creates a response that streams a file's content,
+    answering conditional (If-None-Match, If-Modified-Since) and Range requests.
+    """
+    FileCrud.ensure_content_metadata(db, file)
+    etag = f'"{file.content_hash}"'
+    last_modified = file.last_modified.replace(tzinfo=timezone.utc, microsecond=0) # Stored as naive UTC; HTTP dates have second precision
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "no-cache", # Allow caching, but revalidate
+        "Accept-Ranges": "bytes",
+    }
+
+    # Respond with "Not modified" if the client's copy is up to date
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match != None: # Takes precedence over If-Modified-Since
+        if if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since != None:
+        try:
+            if last_modified <= parsedate_to_datetime(if_modified_since):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError): # Invalid dates are ignored
+            pass
+
+    # Serve partial content; ranges are ignored if If-Range doesn't match the current version
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range == None or if_range == etag):
+        byte_range = parse_range_header(range_header, file.size)
+        if byte_range == False:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{file.size}"})
+        elif byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{file.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(FileCrud.iter_content(file, start, end), status_code=206, media_type=file.mime_type, headers=headers)
+
+    headers["Content-Length"] = str(file.size)
+    if file.storage_path != None: # Let the server send files from disk directly
+        return FileResponse(LOCAL_STORAGE.get_absolute_path(file), media_type=file.mime_type, headers=headers)
+    return StreamingResponse(FileCrud.iter_content(file, 0, file.size - 1), media_type=file.mime_type, headers=headers)
+
+async def create_image_derivative_response(request: Request, db: Session, file: File, width: int | None, height: int | None, format: str | None) -> Response:
+    """
+    Creates a response with a resized version of an image, rendering it if it's not cached.
+    """
+    if not Images.is_available():
+        raise ValueError("Image resizing is not available")
+    FileCrud.ensure_content_metadata(db, file) # Files uploaded before metadata was stored don't have a MIME type yet
+    if not file.mime_type or not file.mime_type.startswith("image/"):
+        raise ValueError("File is not an image")
+    for dimension in (width, height):
+        if dimension != None and not (0 < dimension <= Images.MAX_DIMENSION):
+            raise ValueError(f"Dimensions must be between 1 and {Images.MAX_DIMENSION}")
+    format = format.lower() if format else Images.get_default_format(file.mime_type)
+    if format not in Images.FORMATS:
+        raise ValueError("Unsupported format; must be one of " + ", ".join(Images.FORMATS))
+
+    key = Images.get_derivative_key(width, height, format)
+    etag = f'"{file.content_hash}-{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache", # Allow caching, but revalidate
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match != None and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    derivative = Images.CACHE.get(file.content_hash, key)
+    if derivative == None:
+        derivative = await asyncio.wrap_future(Images.render(file.content_hash, FileCrud.read_content(file), width, height, format))
+    return Response(derivative, media_type=Images.FORMATS[format], headers=headers)
+
+def parse_range_header(range_header: str, size: int) -> tuple[int, int] | None | bool:
+    """
+    Parses a Range header into inclusive start & end positions.
+    Returns None if the header is unsupported and should be ignored,
+    and False if the range cannot be satisfied.
+    """
+    match = RANGE_HEADER_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "": # Suffix range; last N bytes
+        length = int(end)
+        if length == 0 or size == 0: # Empty files have no bytes to return
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end != "" else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+async def read_upload(request: Request, path: str | None) -> tuple[FileSchemas.FileInput, bytes | None]:
+    """
+    Reads a file upload from a request body, which can be either:
+    - JSON for a FileInput, with base64-encoded content
+    - a multipart form with the content in a "file" field and optionally a "path" field
+    - the raw content
+    For multipart and raw uploads, the content is returned as bytes and the path defaults to the one passed.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            return FileSchemas.FileInput.model_validate(await request.json()), None
+        elif content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise ValueError("Multipart uploads require a file field")
+            return FileSchemas.FileInput(path=form.get("path", path)), await upload.read()
+        else:
+            return FileSchemas.FileInput(path=path), await request.body()
+    except ValidationError as e: # Report invalid inputs the same way as for regular body parameters
+        raise RequestValidationError(e.errors())
+
+@router.post("/", response_model=FileSchemas.FileOutput, openapi_extra=UPLOAD_OPENAPI_EXTRA)
+async def upload_file(request: Request, path: str=None, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
     """
     Uploads a file.
+    For multipart and raw uploads, path can be passed as a query parameter.
     """
     try:
-        file = FileCrud.create_file(db, current_user, file_input)
+        file_input, content = await read_upload(request, path)
+        file = FileCrud.create_file(db, current_user, file_input, content)
         return FileCrud.create_file_output(db, file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=FileSchemas.FileTreeOutput)
-async def get_all(db: Session=Depends(get_db), current_user: User=Depends(get_current_user_optional)):
+async def get_all(path: str=None, limit: int=None, skip: int=0, db: Session=Depends(get_db), current_user: User=Depends(get_current_user_optional)):
     """
     Gets all files as a tree structure.
+    path restricts the tree to a folder's contents; limit and skip paginate the files, ordered by path.
     """
     try:
-        return FileCrud.get_tree_output(db)
+        return FileCrud.get_tree_output(db, path, limit, skip)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -52,17 +202,19 @@ async def get_file_metadata(file_path: str, db: Session=Depends(get_db)):
         }
     }
 )
-async def get_file(file_path: str, db: Session=Depends(get_db)):
+async def get_file(file_path: str, request: Request, w: int=None, h: int=None, format: str=None, db: Session=Depends(get_db)):
     """
     Fetches a file's content by its path.
+    Supports conditional and range requests.
+    For images, w, h and format request a resized version that fits within the dimensions, encoded in a format (webp, jpeg or png).
     """
     try:
         file = FileCrud.get_by_path(db, "/" + file_path)
         if not file:
             raise HTTPException(status_code=404)
-        extension = file.path.split(".")[-1].lower()
-        response = Response(content=file.content, media_type=f"image/{extension}", status_code=200)
-        return response
+        if w != None or h != None or format != None:
+            return await create_image_derivative_response(request, db, file, w, h, format)
+        return create_file_response(request, db, file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -80,17 +232,18 @@ async def patch_file(file_path: str, file_update: FileSchemas.FileUpdate, db: Se
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-@router.put("/{file_path:path}", response_model=FileSchemas.FileOutput)
-async def put_file(file_path: str, file_input: FileSchemas.FileInput, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
+@router.put("/{file_path:path}", response_model=FileSchemas.FileOutput, openapi_extra=UPLOAD_OPENAPI_EXTRA)
+async def put_file(file_path: str, request: Request, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
     """
     Uploads or replaces a file.
     """
     try:
+        file_input, content = await read_upload(request, "/" + file_path)
         file = FileCrud.get_by_path(db, "/" + file_path)
         if file:
-            file = FileCrud.update_file(db, file, FileSchemas.FileUpdate(path=file_input.path, content=file_input.content))
+            file = FileCrud.update_file(db, file, FileSchemas.FileUpdate(path=file_input.path, content=file_input.content), content)
         else:
-            file = FileCrud.create_file(db, current_user, file_input)
+            file = FileCrud.create_file(db, current_user, file_input, content)
         return FileCrud.create_file_output(db, file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
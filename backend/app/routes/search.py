@@ -1,35 +1,63 @@
 from typing import Annotated
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.config import get_db
-from core.utils import get_current_user, get_current_user_optional, get_elastic_search
+from core.config import get_async_db, get_db
+from core.utils import get_current_user, get_current_user_optional, get_async_elastic_search, get_elastic_search
+from models.user import User
 import schemas.article as ArticleSchemas
-import crud.article as ArticleCrud
+import schemas.search as SearchSchemas
+import crud.aio.article as ArticleAioCrud
+import crud.search as SearchCrud
+import core.indexer as Indexer
 
 router = APIRouter()
 
 @router.get("/articles", response_model=ArticleSchemas.ArticleSearchResults)
-async def search_articles(text: str=None, tags: Annotated[list[str] | None, Query()]=None, authors: Annotated[list[str] | None, Query()]=None, limit: int=5, db: Session=Depends(get_db), es: Elasticsearch=Depends(get_elastic_search)):
+async def search_articles(text: str=None, tags: Annotated[list[str] | None, Query()]=None, authors: Annotated[list[str] | None, Query()]=None, limit: int=5, db: AsyncSession=Depends(get_async_db), es: AsyncElasticsearch=Depends(get_async_elastic_search)):
     """
     Searches articles of the site.
+    Uses the search engine built into the DB if ES is disabled.
     """
-    # Use "Service unavailable" response if search is disabled
-    if not es:
-        raise HTTPException(status_code=503, detail="Searching is not currently available")
     try:
-        results = ArticleCrud.search_articles(db, es, text=text, tags=tags, authors=authors, limit=limit)
-        return ArticleCrud.create_search_output(db, results)
+        results = await ArticleAioCrud.search_articles(db, es, text=text, tags=tags, authors=authors, limit=limit)
+        return await ArticleAioCrud.create_search_output(db, results)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/articles/latest", response_model=ArticleSchemas.ArticleLatestPosts)
-async def search_articles(limit: int=5, skip: int=0, db: Session=Depends(get_db)):
+async def search_articles(limit: int=5, skip: int=0, cursor: str=None, db: AsyncSession=Depends(get_async_db)):
     """
     Fetches the latest articles published.
+    Pages after the first should be fetched by passing the next_cursor of the previous page; skip is applied after the cursor.
+    """
+    try:
+        results = await ArticleAioCrud.get_latest_articles(db, limit, skip, cursor)
+        return await ArticleAioCrud.create_latest_articles_output(db, results, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/indexing", response_model=SearchSchemas.SearchIndexingStatus)
+async def get_indexing_status(db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
     """
+    Returns how far behind the search index is from article changes.
+    """
+    if not current_user.admin:
+        raise HTTPException(status_code=403, detail="Only admins can view the indexing status")
+    return SearchCrud.get_indexing_status(db)
+
+@router.post("/reindex", response_model=SearchSchemas.ReindexResult)
+def reindex(db: Session=Depends(get_db), es: Elasticsearch=Depends(get_elastic_search), current_user: User=Depends(get_current_user)):
+    """
+    Rebuilds the articles search index from the DB.
+    Sync so that it runs in the threadpool rather than blocking the event loop.
+    """
+    if not current_user.admin:
+        raise HTTPException(status_code=403, detail="Only admins can rebuild the search index")
+    if not es:
+        raise HTTPException(status_code=503, detail="Searching is not currently available")
     try:
-        results = ArticleCrud.get_latest_articles(db, limit, skip)
-        return ArticleCrud.create_latest_articles_output(db, results)
+        return Indexer.reindex_articles(db, es)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,27 +1,38 @@
 from typing import Annotated
 from elasticsearch import Elasticsearch
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.user import User
-from core.config import get_db
+from core.config import get_async_db, get_db
 from core.utils import get_current_user, get_current_user_optional, get_elastic_search
+from routes.file import create_file_response
 import schemas.site as SiteSchemas
 import schemas.article as ArticleSchemas
 import schemas.navigation as NavigationSchemas
 import crud.site as SiteCrud
+import crud.aio.site as SiteAioCrud
 import crud.article as ArticleCrud
 
 router = APIRouter()
 
 @router.get("/config", response_model=SiteCrud.ConfigOutput)
-async def get_config(db: Session=Depends(get_db)):
+async def get_config(request: Request, db: AsyncSession=Depends(get_async_db)):
     """
     Returns the site's global configuration.
+    Supports conditional requests.
     """
     try:
-        config = SiteCrud.get_config(db)
-        return SiteCrud.create_configuration_output(db, config)
+        body, etag = await SiteAioCrud.get_rendered_configuration_output(db)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache", # Allow caching, but revalidate
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match != None and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -40,12 +51,12 @@ async def patch_config(config_update: SiteSchemas.ConfigUpdate, db: Session=Depe
         raise HTTPException(status_code=400, detail=str(e))
     
 @router.get("/sidebar", response_model=SiteSchemas.ConfigSidebarOutput)
-async def get_sidebar(db: Session=Depends(get_db)):
+async def get_sidebar(db: AsyncSession=Depends(get_async_db)):
     """
     Returns the site's sidebar document.
     """
     try:
-        config = SiteCrud.get_config(db)
+        config = await SiteAioCrud.get_config(db)
         if not config.sidebar_document:
             raise HTTPException(status_code=404)
         return SiteSchemas.ConfigSidebarOutput(content=config.sidebar_document)
@@ -61,16 +72,13 @@ async def get_sidebar(db: Session=Depends(get_db)):
         }
     }
 )
-async def get_favicon(db: Session=Depends(get_db)):
+async def get_favicon(request: Request, db: Session=Depends(get_db)):
     """
     Returns the site's favicon.
     """
     config = SiteCrud.get_config(db)
     if config.favicon:
-        # Send raw image data
-        data = config.favicon.content
-        response = Response(content=data, media_type="image/png", status_code=200)
-        return response
+        return create_file_response(request, db, config.favicon)
     raise HTTPException(status_code=404)
 
 @router.get(
@@ -82,14 +90,11 @@ async def get_favicon(db: Session=Depends(get_db)):
         }
     }
 )
-async def get_logo(db: Session=Depends(get_db)):
+async def get_logo(request: Request, db: Session=Depends(get_db)):
     """
     Returns the site's logo.
     """
     config = SiteCrud.get_config(db)
     if config.logo:
-        # Send raw image data
-        data = config.logo.content
-        response = Response(content=data, media_type="image/png", status_code=200)
-        return response
+        return create_file_response(request, db, config.logo)
     raise HTTPException(status_code=404)
\ No newline at end of file
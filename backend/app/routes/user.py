@@ -4,13 +4,15 @@ from sqlalchemy.orm import Session
 from core.config import get_db
 from schemas.user import UserInput, UserOAuthLogin, UserOutput, UserLogin, UserLoginOutput, UserUpdate
 from core.utils import get_current_user, get_current_user_optional
+from core.security import PasswordHashingBusyError
 from models.user import User
 import crud.user as UserCrud
 
 router = APIRouter()
 
+# Endpoints that hash passwords are sync so that FastAPI runs them in its threadpool, off the event loop
 @router.post("/login", response_model=UserLoginOutput)
-async def login(login_input: UserLogin, db: Session=Depends(get_db)):
+def login(login_input: UserLogin, db: Session=Depends(get_db)):
     """
     Authenticates a user and generates a JWT token for them.
     """
@@ -19,6 +21,8 @@ async def login(login_input: UserLogin, db: Session=Depends(get_db)):
         return UserLoginOutput(token=token, **UserCrud.create_user_output(user).model_dump())
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashingBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
 @router.post("/logout", response_model=str)
 async def logout(db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
@@ -32,7 +36,7 @@ async def logout(db: Session=Depends(get_db), current_user: User=Depends(get_cur
     return "Logged out successfully"
 
 @router.post("/", response_model=UserOutput)
-async def add_user(user_input: UserInput, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
+def add_user(user_input: UserInput, db: Session=Depends(get_db), current_user: User=Depends(get_current_user)):
     try:
         user = UserCrud.create_editor_by_user(db, current_user, user_input)
     except ValueError as e:
@@ -41,6 +45,8 @@ async def add_user(user_input: UserInput, db: Session=Depends(get_db), current_u
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=msg)
         else: # Other errors are bad requests
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
+    except PasswordHashingBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     return UserCrud.create_user_output(user)
 
 @router.get("/{username}", response_model=UserOutput)
@@ -81,7 +87,7 @@ async def get_users(role: Optional[UserCrud.UserRole] = None, db: Session=Depend
     return users_output
 
 @router.patch("/{username}", response_model=UserOutput)
-async def update_user(username: str, user_update: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_user(username: str, user_update: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     try:
         userToEdit = UserCrud.get_by_username(db, username)
 
@@ -92,6 +98,8 @@ async def update_user(username: str, user_update: UserUpdate, db: Session = Depe
         user = UserCrud.update_user(db, userToEdit, user_update)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PasswordHashingBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     return UserCrud.create_user_output(user)
 
 @router.delete("/{username}", response_model=str)
@@ -28,8 +28,8 @@ class ArticleInput(ArticleBase):
     filename: Annotated[str, Field(description="Identifier. Must be unique within the article's category. Does not require an extension.")]
     title: str
     content: Annotated[str, Field(description="Markdown-like text content.")]
-    text: Annotated[str, Field(description="Raw unformatted text transcript of the article.")]
-    summary: Annotated[str, Field(description="Should be unformatted text.")]
+    text: Annotated[Optional[str], Field(description="Deprecated and ignored; the transcript is extracted from content.")] = None
+    summary: Annotated[str, Field(description="Should be unformatted text. If empty, the start of the content is used.")]
 
 class ArticleAnnotation(BaseModel):
     """Base schema for article editor annotations."""
@@ -56,7 +56,7 @@ class ArticleUpdate(ArticleBase):
     content: Optional[str] = None # Raw document text
     is_draft: Optional[bool] = None # If true, the content will be saved as a draft and not published
     featured_image_path: Optional[str] = None
-    text: Optional[str] = None
+    text: Optional[str] = None # Deprecated and ignored
     publish_time: Optional[str] = None # As ISO 8601 date
     is_visible: Optional[bool] = None
     view_type: Optional[ArticleViewEnum] = None
@@ -84,6 +84,7 @@ class ArticlePreview(ArticleBase):
     category_sorting_index: int
     authors: list[UserSchema.UserOutput]
     summary: str
+    reading_time: int # Estimated minutes to read the published content
     tags: list[str]
     can_comment: bool
     comments_count: int
@@ -106,6 +107,7 @@ class ArticleSearchResults(BaseModel):
 
 class ArticleLatestPosts(ArticleSearchResults):
     total_articles: int
+    next_cursor: Optional[str] = None # Cursor for fetching the next page; None if there are no more articles.
 
 class TagOutput(BaseModel):
     """Schema for a tag entity."""
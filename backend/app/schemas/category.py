@@ -44,4 +44,5 @@ class CategoryOutput(CategoryPreview):
     """Schema with a complete view of the category's data."""
     articles: list[ArticlePreview]
     total_articles: int # Total amount of articles regardless of pagination limits applied to the articles field.
+    articles_next_cursor: Optional[str] = None # Cursor for fetching the next page of articles; None if there are no more or the articles are not paginated.
     subcategories: list["CategoryOutput"] # Child categories, recursive.
\ No newline at end of file
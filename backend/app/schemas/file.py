@@ -10,7 +10,7 @@ class FileInput(BaseModel):
     Schema for creating files.
     """
     path: str
-    content: str # Base64-encoded.
+    content: Optional[str] = None # Base64-encoded. Omitted for multipart and raw uploads, where the content is sent as bytes.
 
     @field_validator("path", check_fields=False)
     def validate_url(cls, path: str):
@@ -30,9 +30,13 @@ class FilePreview(BaseModel):
 
 class FileOutput(FilePreview):
     """
-    Schema for reading files.
+    Schema for reading file metadata.
+    The content is only served by the file's URL.
     """
-    content: str
+    size: int
+    content_hash: str # SHA-256 hex digest; also the ETag of the content.
+    mime_type: str
+    url: str # API route of the content.
 
 class FileTreeOutput(BaseModel):
     """
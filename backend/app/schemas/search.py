@@ -0,0 +1,22 @@
+"""
+Schemas related to the search index.
+"""
+from typing import Optional
+from pydantic import BaseModel
+
+class SearchIndexingStatus(BaseModel):
+    """
+    Schema for how far behind the search index is.
+    """
+    pending_tasks: int
+    failing_tasks: int # Tasks that have failed at least once and are awaiting a retry
+    lag_seconds: Optional[float] # Age of the oldest pending task; None if the index is up to date
+
+class ReindexResult(BaseModel):
+    """
+    Schema for the outcome of rebuilding the search index.
+    """
+    index: str # Name of the new index
+    indexed_articles: int
+    seconds: float
+    articles_per_second: float
@@ -1,8 +1,11 @@
 from dotenv import load_dotenv
+from alembic import command
 import pytest
+import os
 
 # Load test config
 load_dotenv(dotenv_path="../.test.env")
+os.environ["DB_ASYNC_POOL_SIZE"] = "0" # The test client runs each request in a new event loop, which pooled async connections cannot be shared across
 
 # Must be imported afterwards, as CONFIG depends on env variables
 from utils import get_session
@@ -13,6 +16,11 @@ import crud.category as CategoryCrud
 import crud.file as FileCrud
 import crud.site as SiteCrud
 import crud.comment as CommentCrud
+from models.search import SearchIndexTask
+import core.migrations as Migrations
+
+# Migrate the test DB
+command.upgrade(Migrations.get_alembic_config(), "head")
 
 @pytest.fixture(scope="function", autouse=True)
 def db_session():
@@ -56,6 +64,10 @@ def db_session():
     for comment in CommentCrud.get_all(db):
         CommentCrud.delete_comment(db, comment)
 
+    # Clear queued search index changes
+    db.query(SearchIndexTask).delete()
+    db.commit()
+
     db.close()
 
     yield # Run test
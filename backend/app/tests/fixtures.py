@@ -7,6 +7,8 @@ from dataclasses import dataclass, asdict
 from schemas.category import CategoryOutput
 from schemas.article import ArticleOutput
 from schemas.file import FileOutput, FileInput
+from core.config import CONFIG
+from core.storage import LOCAL_STORAGE
 import pytest
 
 @dataclass
@@ -73,4 +75,14 @@ def file_scenario(user_scenario) -> FileTestScenario:
     return FileTestScenario(
         files=files,
         **asdict(user_scenario)
-    )
\ No newline at end of file
+    )
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path) -> str:
+    """
+    A fixture that stores new file contents in the local storage, under a temporary directory.
+    Returns the directory.
+    """
+    monkeypatch.setattr(CONFIG, "FILE_STORAGE", "local")
+    monkeypatch.setattr(LOCAL_STORAGE, "root", str(tmp_path))
+    return str(tmp_path)
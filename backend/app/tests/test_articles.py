@@ -33,6 +33,23 @@ def test_create_article(article_scenario):
     assert article_output.content == article_input.content
     assert article_output.authors[0].username == article_scenario.editor.username # Check article was properly attributed to user
 
+def test_article_text_extraction(article_scenario):
+    """
+    Tests the summary and reading time derived from article content.
+    """
+    # Create article without a summary
+    article_input = ArticleInput(
+        filename=random_lower_string(),
+        title=random_lower_string(),
+        content="# Heading\n\nSome **bold** text {align=left}\n\n" + "word " * 500,
+        summary="",
+    )
+    response = test_client.post(f"/articles/{article_input.filename}", headers=article_scenario.editor_token_header, json=article_input.model_dump())
+    assert is_ok_response(response)
+    article_output = ArticleOutput.model_validate(response.json())
+    assert article_output.summary.startswith("Heading Some bold text word") # Summary is taken from content, without formatting
+    assert article_output.reading_time == 3 # 504 words
+
 def test_create_article_nonexistent_category(article_scenario):
     """
     Tests creating an article in a category that doesn't exist.
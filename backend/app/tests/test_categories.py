@@ -5,6 +5,7 @@ from fastapi.testclient import TestClient
 from main import app
 from models.category import CategorySortingModeEnum
 from schemas.category import CategoryInput, CategoryOutput, CategoryUpdate
+from schemas.article import ArticleOutput
 from asserts import *
 from fixtures import *
 
@@ -152,6 +153,21 @@ def test_get_category_articles(article_scenario):
         article = articles[i]
         assert category_output.articles[i - skip].filename == article.filename
 
+    # Test paginating with cursors
+    filenames = []
+    cursor = None
+    for _ in range(2):
+        params = {"published_only": False, "articles_amount": amount}
+        if cursor:
+            params["articles_cursor"] = cursor
+        response = client.get(f"/categories/{article_scenario.category_path[1:]}", params=params, headers=article_scenario.editor_token_header)
+        assert is_ok_response(response)
+        category_output = CategoryOutput.model_validate(response.json())
+        filenames.extend(article.filename for article in category_output.articles)
+        cursor = category_output.articles_next_cursor
+    assert filenames == [article.filename for article in articles]
+    assert cursor == None
+
     # Test ordering articles manually
     response = client.patch(f"/categories/{article_scenario.category_path[1:]}", headers=article_scenario.editor_token_header, json={
         "sorting_type": CategorySortingModeEnum.manual.name,
@@ -192,3 +208,79 @@ def test_category_change_parent(article_scenario):
     # Get category from new path
     response = client.get(f"/categories/{category_output.path[1:]}", headers=article_scenario.editor_token_header)
     assert is_ok_response(response)
+
+def test_category_change_parent_subtree(article_scenario):
+    """
+    Tests that moving a category updates the paths and breadcrumbs of its subcategories and articles.
+    """
+    db = get_session()
+    new_category = create_random_category(db)
+
+    # Create a subcategory with an article
+    response = client.post("/categories", headers=article_scenario.editor_token_header, json={
+        "name": "subcategory",
+        "directory_name": "subcategory",
+        "parent_category_path": article_scenario.category_path,
+    })
+    assert is_ok_response(response)
+    subcategory = CategoryOutput.model_validate(response.json())
+    article = create_random_article(db, subcategory.path)
+
+    # Move the parent category
+    response = client.patch(f"/categories/{article_scenario.category_path[1:]}", headers=article_scenario.editor_token_header, json={
+        "parent_category_path": new_category.path,
+    })
+    assert is_ok_response(response)
+    moved_category = CategoryOutput.model_validate(response.json())
+    assert moved_category.path == f"{new_category.path}/{article_scenario.category.directory_name}"
+    assert moved_category.subcategories[0].path == f"{moved_category.path}/subcategory"
+
+    # Expect the article to be reachable under the new path, with updated breadcrumbs
+    response = client.get(f"/articles{moved_category.path}/subcategory/{article.filename}", headers=article_scenario.editor_token_header)
+    assert is_ok_response(response)
+    article_output = ArticleOutput.model_validate(response.json())
+    assert article_output.category_path == f"{moved_category.path}/subcategory"
+    assert article_output.parent_category_names == ["/", new_category.name, article_scenario.category.name, "subcategory"]
+
+    # Attempt to move the category into its own subcategory
+    response = client.patch(f"/categories{moved_category.path}", headers=article_scenario.editor_token_header, json={
+        "parent_category_path": f"{moved_category.path}/subcategory",
+    })
+    assert is_bad_request(response, "Cannot move a category into itself")
+
+def test_get_category_tree_limits(article_scenario):
+    """
+    Tests limiting the depth and subcategory articles of a category tree.
+    """
+    db = get_session()
+
+    # Create a subcategory and more articles
+    response = client.post("/categories", headers=article_scenario.editor_token_header, json={
+        "name": "subcategory",
+        "directory_name": "subcategory",
+        "parent_category_path": article_scenario.category_path,
+    })
+    assert is_ok_response(response)
+    create_random_article(db, article_scenario.category_path)
+
+    # Fetch the root without limits
+    category_output = client.get("/categories/?published_only=False", headers=article_scenario.editor_token_header)
+    category_output = CategoryOutput.model_validate(category_output.json())
+    category = next(subcategory for subcategory in category_output.subcategories if subcategory.id == article_scenario.category.id)
+    assert len(category.articles) == 2
+    assert category.total_articles == 2
+    assert len(category.subcategories) == 1
+
+    # Limit articles of subcategories
+    response = client.get("/categories/?published_only=False&subcategory_articles_amount=1", headers=article_scenario.editor_token_header)
+    category_output = CategoryOutput.model_validate(response.json())
+    category = next(subcategory for subcategory in category_output.subcategories if subcategory.id == article_scenario.category.id)
+    assert len(category.articles) == 1
+    assert category.total_articles == 2
+
+    # Limit depth
+    response = client.get("/categories/?depth=1", headers=article_scenario.editor_token_header)
+    category_output = CategoryOutput.model_validate(response.json())
+    assert len(category_output.subcategories) > 0
+    for subcategory in category_output.subcategories:
+        assert len(subcategory.subcategories) == 0
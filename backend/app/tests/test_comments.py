@@ -4,8 +4,8 @@ Tests for /comments/ API.
 from fastapi.testclient import TestClient
 from main import app
 from schemas.comment import *
-from schemas.article import ArticleUpdate
-from utils import ClientWrapper
+from schemas.article import ArticleOutput, ArticleUpdate
+from utils import ClientWrapper, create_random_auth_editor, get_session, get_token_header
 from asserts import *
 from fixtures import *
 
@@ -82,6 +82,35 @@ def test_delete_comment(article_scenario):
     output = client.get_and_validate(f"/comments{article_scenario.article_path}", CommentsOutput)
     assert len(output.comments) == len(comments) - 1
 
+    # Expect the article's comment counter to exclude the deleted comment and its replies
+    article_output = client.get_and_validate(f"/articles{article_scenario.article_path}", ArticleOutput)
+    assert article_output.comments_count == (len(comments) - 1) * (1 + len(replies))
+
+def test_delete_commenter(article_scenario):
+    """
+    Tests that deleting a user's account removes their comments and the replies to them from comment counters.
+    """
+    client = ClientWrapper(test_client, article_scenario.editor_token_header)
+    commenter = create_random_auth_editor(get_session())
+    commenter_client = ClientWrapper(test_client, get_token_header(commenter.token))
+
+    # Post a comment by the commenter with a reply to it, and a comment by another user
+    response = commenter_client.post(f"/comments{article_scenario.article_path}", CommentInput(content="comment"))
+    assert is_ok_response(response)
+    comment_output = CommentOutput.model_validate(response.json())
+    response = client.post(f"/comments{article_scenario.article_path}", CommentInput(content="reply", parent_comment_id=comment_output.id))
+    assert is_ok_response(response)
+    response = client.post(f"/comments{article_scenario.article_path}", CommentInput(content="other comment"))
+    assert is_ok_response(response)
+
+    # Delete the commenter
+    response = test_client.delete(f"/users/{commenter.username}", headers=article_scenario.admin_token_header)
+    assert is_ok_response(response)
+
+    # Expect only the other user's comment to remain counted
+    article_output = client.get_and_validate(f"/articles{article_scenario.article_path}", ArticleOutput)
+    assert article_output.comments_count == 1
+
 def test_cant_comment(article_scenario):
     """
     Tests attempting to comment on articles with comments disabled.
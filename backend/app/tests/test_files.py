@@ -3,12 +3,20 @@
 """
 import random
 from fastapi.testclient import TestClient
-from utils import create_random_file_content
+from utils import create_random_file_content, get_session
+from argparse import Namespace
 from main import app
 from schemas.file import *
+from models.file import File
+import crud.file as FileCrud
+import cli
+import os
 from asserts import *
 from fixtures import *
+from PIL import Image
 import base64
+import hashlib
+import io
 
 client = TestClient(app)
 
@@ -27,9 +35,39 @@ def test_create_file(user_scenario):
 
     file_output = FileOutput.model_validate(response.json())
     assert file_output.uploader.username == user_scenario.editor.username
-    assert file_output.content == content_str
+    assert file_output.size == len(content_bytes)
+    assert file_output.content_hash == hashlib.sha256(content_bytes).hexdigest()
     assert file_output.path == file_input.path
 
+    # Fetch the content from its URL
+    response = client.get(file_output.url)
+    assert response.content == content_bytes
+
+def test_upload_file_bytes(user_scenario):
+    """
+    Tests uploading files as multipart forms and raw bodies.
+    """
+    # Upload a multipart form
+    content_bytes, _ = create_random_file_content()
+    response = client.post("/files", headers=user_scenario.editor_token_header, data={"path": "/multipart/file.png"}, files={"file": ("file.png", content_bytes)})
+    assert is_ok_response(response)
+    file_output = FileOutput.model_validate(response.json())
+    assert file_output.path == "/multipart/file.png"
+    assert file_output.mime_type == "image/png"
+    assert client.get(file_output.url).content == content_bytes
+
+    # Replace the file with a raw body
+    new_content_bytes, _ = create_random_file_content()
+    response = client.put("/files/multipart/file.png", headers={**user_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=new_content_bytes)
+    assert is_ok_response(response)
+    file_output = FileOutput.model_validate(response.json())
+    assert file_output.size == len(new_content_bytes)
+    assert client.get(file_output.url).content == new_content_bytes
+
+    # Attempt a raw upload with an invalid path
+    response = client.post("/files", params={"path": "no_leading_slash.bin"}, headers={**user_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=content_bytes)
+    assert has_validation_error(response, "start with a slash")
+
 def test_create_file_invalid_path(file_scenario):
     """
     Tests creating files with invalid paths.
@@ -75,7 +113,7 @@ def test_patch_file(file_scenario):
     response = client.get(f"/files/{file.path[1:]}/metadata", headers=file_scenario.editor_token_header)
     assert is_ok_response(response)
     file_output = FileOutput.model_validate(response.json())
-    assert file_output.content == new_content_str
+    assert file_output.content_hash == hashlib.sha256(new_content_bytes).hexdigest()
 
     # Patch file path
     file = file_scenario.files[1]
@@ -90,8 +128,223 @@ def test_patch_file(file_scenario):
     assert is_ok_response(response)
     file_output = FileOutput.model_validate(response.json())
     assert file_output.path == new_path
-    assert file_output.content == file.content
+    assert file_output.url == "/files" + new_path
+    assert file_output.content_hash == file.content_hash
 
     # Expect 404 from previous path
     response = client.get(f"/files/{file.path[1:]}/metadata", headers=file_scenario.editor_token_header)
     assert is_not_found(response)
+
+def test_get_file_conditional_and_range(file_scenario):
+    """
+    Tests fetching file contents with validators and byte ranges.
+    """
+    content_bytes, content_str = create_random_file_content()
+    response = client.put("/files/range/file.png", headers=file_scenario.editor_token_header, json={
+        "path": "/range/file.png",
+        "content": content_str,
+    })
+    assert is_ok_response(response)
+
+    # Fetch the whole file
+    response = client.get("/files/range/file.png")
+    assert response.status_code == 200
+    assert response.content == content_bytes
+    assert response.headers["content-type"] == "image/png"
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    # Expect validators to result in "Not modified" responses
+    response = client.get("/files/range/file.png", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get("/files/range/file.png", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # Fetch partial content
+    response = client.get("/files/range/file.png", headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.content == content_bytes[2:6]
+    assert response.headers["content-range"] == f"bytes 2-5/{len(content_bytes)}"
+    response = client.get("/files/range/file.png", headers={"Range": "bytes=-3"})
+    assert response.status_code == 206
+    assert response.content == content_bytes[-3:]
+
+    # Attempt to fetch a range past the end of the file
+    response = client.get("/files/range/file.png", headers={"Range": f"bytes={len(content_bytes)}-"})
+    assert response.status_code == 416
+
+    # Attempt to fetch the last bytes of an empty file
+    response = client.put("/files/range/empty.png", headers={**file_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=b"")
+    assert is_ok_response(response)
+    response = client.get("/files/range/empty.png", headers={"Range": "bytes=-10"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+
+    # Expect replacing the content to change the ETag
+    _, new_content_str = create_random_file_content()
+    response = client.patch("/files/range/file.png", headers=file_scenario.editor_token_header, json={
+        "content": new_content_str,
+    })
+    assert is_ok_response(response)
+    response = client.get("/files/range/file.png", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_get_file_tree(file_scenario):
+    """
+    Tests fetching the file tree, filtered by folder and paginated.
+    """
+    for path in ["/tree/a.png", "/tree/sub/b.png", "/tree/sub/c.png"]:
+        _, content_str = create_random_file_content()
+        response = client.post("/files", headers=file_scenario.editor_token_header, json=FileInput(path=path, content=content_str).model_dump())
+        assert is_ok_response(response)
+
+    # Fetch the whole tree
+    response = client.get("/files")
+    assert is_ok_response(response)
+    tree = FileTreeOutput.model_validate(response.json())
+    assert len(tree.files) == len(file_scenario.files)
+    assert tree.subfolders["tree"].subfolders["sub"].path == "/tree/sub"
+    assert len(tree.subfolders["tree"].subfolders["sub"].files) == 2
+
+    # Fetch only a folder's contents
+    response = client.get("/files", params={"path": "/tree/sub"})
+    assert is_ok_response(response)
+    tree = FileTreeOutput.model_validate(response.json())
+    assert len(tree.files) == 0
+    assert list(tree.subfolders.keys()) == ["tree"]
+    assert [file.filename for file in tree.subfolders["tree"].subfolders["sub"].files] == ["b.png", "c.png"]
+    assert len(tree.subfolders["tree"].files) == 0
+
+    # Paginate the folder's files
+    response = client.get("/files", params={"path": "/tree", "limit": 1, "skip": 1})
+    assert is_ok_response(response)
+    tree = FileTreeOutput.model_validate(response.json())
+    assert len(tree.subfolders["tree"].files) == 0
+    assert [file.path for file in tree.subfolders["tree"].subfolders["sub"].files] == ["/tree/sub/b.png"]
+
+def test_get_image_derivative(file_scenario):
+    """
+    Tests fetching resized versions of images.
+    """
+    image = io.BytesIO()
+    Image.new("RGB", (800, 400)).save(image, "PNG")
+    response = client.put("/files/derivative/image.png", headers={**file_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=image.getvalue())
+    assert is_ok_response(response)
+
+    # Fetch a resized version
+    response = client.get("/files/derivative/image.png", params={"w": 200, "format": "webp"})
+    assert is_ok_response(response)
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).size == (200, 100)
+    etag = response.headers["etag"]
+
+    # Expect the cached version to be validated by its ETag
+    response = client.get("/files/derivative/image.png", params={"w": 200, "format": "webp"}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Expect replacing the image to invalidate its resized versions
+    image = io.BytesIO()
+    Image.new("RGB", (400, 400)).save(image, "PNG")
+    response = client.put("/files/derivative/image.png", headers={**file_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=image.getvalue())
+    assert is_ok_response(response)
+    response = client.get("/files/derivative/image.png", params={"w": 200, "format": "webp"}, headers={"If-None-Match": etag})
+    assert is_ok_response(response)
+    assert Image.open(io.BytesIO(response.content)).size == (200, 200)
+
+    # Attempt to resize files that aren't images, or past the max size
+    response = client.get(f"/files/{file_scenario.files[0].path[1:]}", params={"w": 200})
+    assert is_bad_request(response, "not an image")
+    response = client.get("/files/derivative/image.png", params={"w": 100000})
+    assert is_bad_request(response, "Dimensions")
+
+def test_get_legacy_image_derivative(file_scenario):
+    """
+    Tests fetching resized versions of images uploaded before their metadata was stored.
+    """
+    image = io.BytesIO()
+    Image.new("RGB", (800, 400)).save(image, "PNG")
+    response = client.put("/files/legacy/image.png", headers={**file_scenario.editor_token_header, "Content-Type": "application/octet-stream"}, content=image.getvalue())
+    assert is_ok_response(response)
+
+    # Clear the metadata, as for files from before it was stored
+    db = get_session()
+    db.query(File).filter(File.path == "/legacy/image.png").update({File.mime_type: None, File.content_hash: None})
+    db.commit()
+
+    # Expect the metadata to be filled in before checking whether the file is an image
+    response = client.get("/files/legacy/image.png", params={"w": 200})
+    assert is_ok_response(response)
+    assert response.headers["content-type"] == "image/png"
+    assert Image.open(io.BytesIO(response.content)).size == (200, 100)
+
+def test_local_storage(user_scenario, local_storage):
+    """
+    Tests storing file contents in the local filesystem.
+    """
+    content_bytes, content_str = create_random_file_content()
+    content_hash = hashlib.sha256(content_bytes).hexdigest()
+    blob_path = os.path.join(local_storage, content_hash[:2], content_hash[2:4], content_hash)
+
+    # Upload the same content twice
+    for path in ["/local/a.png", "/local/b.png"]:
+        response = client.post("/files", headers=user_scenario.editor_token_header, json=FileInput(path=path, content=content_str).model_dump())
+        assert is_ok_response(response)
+
+    # Expect a single blob under the sharded path, without leftover temporary files
+    db = get_session()
+    files = db.query(File).filter(File.path.in_(["/local/a.png", "/local/b.png"])).all()
+    assert [file.storage_path for file in files] == [os.path.relpath(blob_path, local_storage)] * 2
+    assert all(file.content == None for file in files)
+    assert os.listdir(os.path.dirname(blob_path)) == [content_hash]
+    with open(blob_path, "rb") as blob:
+        assert blob.read() == content_bytes
+
+    # Fetch the content from disk, whole and partially
+    response = client.get("/files/local/a.png")
+    assert response.status_code == 200
+    assert response.content == content_bytes
+    assert response.headers["content-length"] == str(len(content_bytes))
+    response = client.get("/files/local/a.png", headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.content == content_bytes[2:6]
+
+    # Expect the blob to be kept while another file references it
+    response = client.delete("/files/local/a.png", headers=user_scenario.editor_token_header)
+    assert is_ok_response(response)
+    assert os.path.exists(blob_path)
+    assert client.get("/files/local/b.png").content == content_bytes
+
+    # Expect the blob to be deleted along with the last file referencing it
+    response = client.delete("/files/local/b.png", headers=user_scenario.editor_token_header)
+    assert is_ok_response(response)
+    assert not os.path.exists(blob_path)
+
+def test_local_storage_rollback(local_storage):
+    """
+    Tests that blobs written by uncommitted uploads are deleted.
+    """
+    content_bytes, _ = create_random_file_content()
+    db = get_session()
+    file = File(path="/local/rolled_back.png")
+    FileCrud.set_content(db, file, content_bytes)
+    assert os.path.exists(os.path.join(local_storage, file.storage_path))
+
+    db.rollback()
+    assert not os.path.exists(os.path.join(local_storage, file.storage_path))
+
+def test_migrate_files(file_scenario, local_storage):
+    """
+    Tests moving file contents from the DB to the local storage.
+    """
+    cli.migrate_files(Namespace())
+
+    db = get_session()
+    for file_output in file_scenario.files:
+        file = FileCrud.get_by_path(db, file_output.path)
+        assert file.storage_path != None and file.content == None
+        assert os.path.exists(os.path.join(local_storage, file.storage_path))
+        response = client.get(file_output.url)
+        assert response.status_code == 200
+        assert response.content == FileCrud.read_content(file)
+        assert hashlib.sha256(response.content).hexdigest() == file.content_hash
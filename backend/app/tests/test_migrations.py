@@ -0,0 +1,20 @@
+"""
+Tests for the DB schema migrations.
+"""
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from core.config import Base
+from utils import get_session
+import core.migrations as Migrations
+
+def test_schema_is_migrated():
+    """
+    Tests that the migrated schema is at the latest revision and matches the models.
+    """
+    db = get_session()
+    Migrations.check_revision(db) # Should not raise
+
+    # Expect no differences that would require a new migration
+    differences = compare_metadata(MigrationContext.configure(db.connection()), Base.metadata)
+    assert differences == []
+    db.close()
@@ -0,0 +1,100 @@
+"""
+Tests for authenticating with Google identity tokens, against a local stub of Google's key server.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography.hazmat.primitives.asymmetric import rsa
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from main import app
+from core.config import CONFIG
+from utils import get_token_header, random_lower_string
+from asserts import *
+import core.security as Security
+import threading
+import pytest
+import json
+import jwt
+
+CLIENT_ID = "test-client"
+KEY_ID = "test-key"
+
+client = TestClient(app)
+
+@dataclass
+class KeyServer:
+    url: str
+    private_key: rsa.RSAPrivateKey
+    requests: list[str]
+
+@pytest.fixture
+def key_server(monkeypatch) -> KeyServer:
+    """
+    A fixture that serves a signing key over HTTP the way Google does, and has the app fetch keys from it.
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update(kid=KEY_ID, alg="RS256", use="sig")
+    requests = []
+
+    class KeyRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            body = json.dumps({"keys": [public_jwk]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "public, max-age=3600")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeyRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/oauth2/v3/certs"
+    monkeypatch.setattr(Security, "google_jwks", Security.JWKSCache(url))
+    monkeypatch.setattr(CONFIG, "GOOGLE_CLIENT_URL", CLIENT_ID, raising=False)
+
+    yield KeyServer(url=url, private_key=private_key, requests=requests)
+
+    server.shutdown()
+    server.server_close()
+
+def create_google_token(key_server: KeyServer, subject: str, key_id: str=KEY_ID) -> str:
+    """
+    Creates an identity token signed by the stub key server.
+    """
+    now = datetime.now(timezone.utc)
+    return jwt.encode({
+        "iss": Security.GOOGLE_JWT_ISSUER,
+        "aud": CLIENT_ID,
+        "sub": subject,
+        "iat": now,
+        "exp": now + timedelta(hours=1),
+        "jti": random_lower_string(), # Make each token unique
+    }, key_server.private_key, algorithm="RS256", headers={"kid": key_id})
+
+def test_google_token_auth(key_server: KeyServer):
+    """
+    Tests authenticating as a reader with Google tokens, fetching the signing keys only once.
+    """
+    subject = random_lower_string()
+
+    # Authenticate twice with different tokens; the first creates the reader account
+    for _ in range(2):
+        response = client.get("/users/", headers=get_token_header(create_google_token(key_server, subject)))
+        assert is_ok_response(response)
+    assert len(key_server.requests) == 1 # Keys should be cached per their max-age
+
+def test_google_token_unknown_key(key_server: KeyServer):
+    """
+    Tests that tokens signed with an unknown key are rejected.
+    """
+    Security.google_jwks.get_signing_key(KEY_ID) # Fetch the keys
+    response = client.get("/users/", headers=get_token_header(create_google_token(key_server, random_lower_string(), key_id="rotated-key")))
+    assert response.status_code == 403
+
+    # The lookup miss should not have fetched the keys again within the request, as they were just fetched
+    assert len(key_server.requests) == 1
@@ -0,0 +1,61 @@
+"""
+Tests that frequent queries are served by indexes rather than sequential scans.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from utils import create_random_article_post
+from fixtures import *
+import pytest
+
+SEEDED_ARTICLES = 20
+
+# Frequent queries and the tables they must not scan sequentially
+HOT_QUERIES = {
+    "article_authors_by_author": ("article_authors", "SELECT article_id FROM article_authors WHERE author_id = :id"),
+    "article_authors_by_article": ("article_authors", "SELECT author_id FROM article_authors WHERE article_id = :id"),
+    "article_tags_by_tag": ("article_tags", "SELECT article_id FROM article_tags WHERE tag_id = :id"),
+    "article_tags_by_article": ("article_tags", "SELECT tag_id FROM article_tags WHERE article_id = :id"),
+    "comments_by_article": ("comments", "SELECT id FROM comments WHERE article_id = :id ORDER BY post_time"),
+    "comment_replies": ("comments", "SELECT id FROM comments WHERE parent_comment_id = :id"),
+    "subcategories": ("categories", "SELECT id FROM categories WHERE parent_id = :id"),
+    "credentials_by_oauth_id": ("credentials", "SELECT id FROM credentials WHERE oauth_id = CAST(:id AS VARCHAR)"),
+    "latest_articles": ("articles", "SELECT id FROM articles WHERE is_visible = true AND publish_time IS NOT NULL ORDER BY publish_time DESC, id DESC LIMIT 5"),
+    "category_articles": ("articles", "SELECT id FROM articles WHERE category_id = :id AND is_visible = true AND publish_time IS NOT NULL ORDER BY publish_time, id LIMIT 5"),
+}
+
+def get_plan_scans(plan: dict) -> list[dict]:
+    """
+    Returns the nodes of a JSON query plan that read a table.
+    """
+    nodes = [plan] if "Relation Name" in plan else []
+    for subplan in plan.get("Plans", []):
+        nodes.extend(get_plan_scans(subplan))
+    return nodes
+
+def explain(db: Session, query: str, params: dict) -> dict:
+    """
+    Returns the plan of a query, with sequential scans discouraged so that any usable index is picked regardless of the table size.
+    """
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.execute(text("EXPLAIN (FORMAT JSON) " + query), params).scalar()
+    db.rollback()
+    return plan[0]["Plan"]
+
+@pytest.mark.parametrize("query_name", HOT_QUERIES.keys())
+def test_hot_queries_use_indexes(user_scenario, query_name: str):
+    """
+    Tests that frequent queries have an index to look rows up with.
+    """
+    db = get_session()
+    for minutes in range(SEEDED_ARTICLES):
+        create_random_article_post(db, "/", -minutes)
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+    table, query = HOT_QUERIES[query_name]
+    scans = [scan for scan in get_plan_scans(explain(db, query, {"id": 1})) if scan["Relation Name"] == table]
+    assert len(scans) > 0
+    for scan in scans:
+        # Index scans filter by an index condition; bitmap scans do so in their child index scan
+        assert scan["Node Type"] != "Seq Scan", f"{query_name} scans {table} sequentially"
+        assert "Index Cond" in scan or scan["Node Type"] == "Bitmap Heap Scan", f"{query_name} reads all of an index of {table}"
@@ -4,9 +4,13 @@ Tests for /search/ API endpoints.
 from fastapi.testclient import TestClient
 from main import app
 from schemas.article import ArticleInput, ArticleLatestPosts, ArticleOutput, ArticleUpdate
-from utils import create_random_article_post, create_random_editor, random_lower_string
+from schemas.search import SearchIndexingStatus
+from utils import create_random_article_post, random_lower_string
 from asserts import *
 from fixtures import *
+import crud.article as ArticleCrud
+import crud.search as SearchCrud
+import pytest
 
 client = TestClient(app)
 
@@ -40,3 +44,96 @@ def test_get_latest_posts(user_scenario):
     assert is_ok_response(response)
     articles_output = ArticleLatestPosts.model_validate(response.json())
     assert articles_output.total_articles == len(articles) # Expect posted article count to NOT have changed
+
+def test_latest_posts_cursor(user_scenario):
+    """
+    Tests paginating latest posts with cursors.
+    """
+    db = get_session()
+    articles = [create_random_article_post(db, "/", -minutes) for minutes in range(5)]
+
+    # Fetch all pages
+    titles = []
+    cursor = None
+    for _ in range(3):
+        response = client.get("/search/articles/latest", params={"limit": 2, "cursor": cursor} if cursor else {"limit": 2})
+        assert is_ok_response(response)
+        articles_output = ArticleLatestPosts.model_validate(response.json())
+        assert articles_output.total_articles == len(articles)
+        titles.extend(article.title for article in articles_output.results)
+        cursor = articles_output.next_cursor
+    assert titles == [article.title for article in articles]
+    assert cursor == None # Last page should not have a cursor
+
+    # Expect the cached total to be updated when an article is posted
+    create_random_article_post(db, "/", -10)
+    response = client.get("/search/articles/latest", params={"limit": 2})
+    assert ArticleLatestPosts.model_validate(response.json()).total_articles == len(articles) + 1
+
+    # Test invalid cursor
+    response = client.get("/search/articles/latest", params={"limit": 2, "cursor": "invalid"})
+    assert response.status_code == 400
+
+def test_search_hit_order():
+    """
+    Tests that articles hit by a search are returned in order of relevance,
+    skipping hits of articles that are no longer in the DB.
+    """
+    db = get_session()
+    articles = [create_random_article(db, "/") for _ in range(3)]
+    MISSING_ID = max(article.id for article in articles) + 1000
+
+    # Stand-in for ES that returns hits in a set order, including one of an article that doesn't exist
+    class SearchStub:
+        def search(self, **kwargs):
+            hit_ids = [articles[2].id, MISSING_ID, articles[0].id, articles[1].id]
+            return {"hits": {"hits": [{"_id": str(article_id)} for article_id in hit_ids]}}
+
+    with pytest.warns(UserWarning, match=str(MISSING_ID)):
+        results = ArticleCrud.search_articles(db, SearchStub(), "test", None, None, 10)
+    assert [article.id for article in results] == [articles[2].id, articles[0].id, articles[1].id]
+
+def test_indexing_status(article_scenario):
+    """
+    Tests reporting queued search index changes.
+    """
+    db = get_session()
+    SearchCrud.enqueue_article(db, article_scenario.article.id)
+    db.commit()
+
+    response = client.get("/search/indexing", headers=article_scenario.admin_token_header)
+    assert is_ok_response(response)
+    status = SearchIndexingStatus.model_validate(response.json())
+    assert status.pending_tasks >= 1 # Creating the article also queues a task if ES is enabled
+    assert status.lag_seconds != None
+
+    # Only admins can view the status
+    response = client.get("/search/indexing", headers=article_scenario.editor_token_header)
+    assert response.status_code == 403
+
+def test_reindex_permissions(user_scenario):
+    """
+    Tests that only admins can rebuild the search index.
+    """
+    response = client.post("/search/reindex", headers=user_scenario.editor_token_header)
+    assert response.status_code == 403
+
+def test_search_without_es():
+    """
+    Tests searching articles with the search engine built into the DB.
+    """
+    db = get_session()
+    articles = [create_random_article(db, "/") for _ in range(3)]
+
+    # Search by title prefix
+    results = ArticleCrud.search_articles(db, None, articles[0].title[:6], None, None, 10)
+    assert [article.id for article in results] == [articles[0].id]
+
+    # Search by tag
+    ArticleCrud.update_article(db, ArticleCrud.get_article(db, articles[1].id), ArticleUpdate(tags=["searchtag"]))
+    results = ArticleCrud.search_articles(db, None, None, ["searchtag"], None, 10)
+    assert [article.id for article in results] == [articles[1].id]
+
+    # Search by author
+    results = ArticleCrud.search_articles(db, None, None, None, [articles[2].authors[0].display_name], 10)
+    assert [article.id for article in results] == [articles[2].id]
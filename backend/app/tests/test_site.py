@@ -3,7 +3,7 @@ Tests for /site/ API.
 """
 import random
 from fastapi.testclient import TestClient
-from utils import create_random_file_content
+from utils import create_random_article, create_random_file_content
 from main import app
 from schemas.site import *
 from schemas.navigation import *
@@ -153,3 +153,42 @@ def test_patch_sidebar(article_scenario):
     assert is_ok_response(response)
     sidebar_output = ConfigSidebarOutput.model_validate(response.json())
     assert sidebar_output.content == sidebar_content
+
+def test_config_cache(article_scenario):
+    """
+    Tests revalidating the cached site config.
+    """
+    scenario = article_scenario
+    config_update = ConfigUpdate(
+        navigation=NavigationUpdate(
+            root_nodes=[
+                NavigationCategory(category_path=article_scenario.category_path),
+            ]
+        )
+    )
+    response = client.patch("/site/config", headers=scenario.admin_token_header, json=config_update.model_dump(exclude_none=True))
+    assert is_ok_response(response)
+
+    # Expect the config to be unchanged between requests
+    response = client.get("/site/config")
+    assert is_ok_response(response)
+    etag = response.headers["etag"]
+    response = client.get("/site/config", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Expect changes to categories in the navigation to be reflected
+    response = client.patch(f"/categories{article_scenario.category_path}", headers=scenario.admin_token_header, json={
+        "name": "Renamed category",
+    })
+    assert is_ok_response(response)
+    response = client.get("/site/config", headers={"If-None-Match": etag})
+    assert is_ok_response(response)
+    site = ConfigOutput.model_validate(response.json())
+    assert site.navigation.root_nodes[0].category.name == "Renamed category"
+    assert response.headers["etag"] != etag
+
+    # Expect changes to entities outside of the config to keep it cached
+    etag = response.headers["etag"]
+    create_random_article(get_session(), article_scenario.category_path)
+    response = client.get("/site/config", headers={"If-None-Match": etag})
+    assert response.status_code == 304
@@ -1,11 +1,18 @@
 """
     Tests for /users/ API.
 """
-from schemas.user import UserRole, MIN_USERNAME_LENGTH
-from utils import create_random_auth_editor, create_random_editor, create_random_admin, get_session, get_token_header, random_lower_string, random_email, create_random_user_input, random_password
+from schemas.user import UserRole, UserUpdate, MIN_USERNAME_LENGTH
+from schemas.article import ArticleLatestPosts, ArticleUpdate
+from utils import create_random_article_post, create_random_auth_editor, create_random_editor, create_random_admin, get_session, get_token_header, random_lower_string, random_email, create_random_user_input, random_password
 from asserts import *
+from fixtures import *
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
 from main import app
+import core.security as Security
+import crud.article as ArticleCrud
+import crud.user as UserCrud
+import threading
 
 client = TestClient(app)
 
@@ -240,6 +247,10 @@ def test_delete_user():
     response = client.delete(f"/users/{editor.username}", headers=admin_header)
     assert is_ok_response(response)
 
+    # Expect the deleted account's token to no longer be accepted, even though it was used (and cached) before
+    response = client.get("/users/", headers=editor_header)
+    assert response.status_code == 401
+
     # Admins can delete their own account
     response = client.delete(f"/users/{admin.username}", headers=admin_header)
     assert is_ok_response(response)
@@ -279,3 +290,91 @@ def test_get_all_users():
         if user["username"] == editor.username:
             has_editor = True
     assert not has_admin and has_editor
+
+def test_login_rehash():
+    """
+        Tests that logging in rehashes passwords hashed with a different cost factor.
+    """
+    db = get_session()
+    user = create_random_editor(db)
+    credentials = UserCrud.get_by_username(db, user.username).credentials
+    credentials.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash(user.password)
+    db.commit()
+    assert Security.pwd_context.needs_update(credentials.hashed_password)
+
+    response = client.post("/users/login", json={
+        "username": user.username,
+        "password": user.password,
+    })
+    assert is_ok_response(response)
+
+    # The hash should now use the configured cost factor, and still match the password
+    db.refresh(credentials)
+    assert not Security.pwd_context.needs_update(credentials.hashed_password)
+    assert Security.pwd_context.verify(user.password, credentials.hashed_password)
+
+def test_login_hashing_busy(monkeypatch):
+    """
+        Tests that logins are rejected while the password hashing queue is full.
+    """
+    user = create_random_editor(get_session())
+    monkeypatch.setattr(Security, "_hashing_slots", threading.Semaphore(0)) # No free slots
+
+    response = client.post("/users/login", json={
+        "username": user.username,
+        "password": user.password,
+    })
+    assert response.status_code == 503
+
+def test_get_users_by_role():
+    """
+    Tests filtering users by role.
+    """
+    db = get_session()
+    admin, editor = create_random_admin(db), create_random_editor(db)
+    admin_header = get_token_header(admin.token)
+
+    for role, user, other_user in [(UserRole.editor, editor, admin), (UserRole.admin, admin, editor)]:
+        response = client.get("/users/", headers=admin_header, params={"role": role.value})
+        assert is_ok_response(response)
+        users = response.json()
+        assert all(user["role"] == role.name for user in users)
+        usernames = [user["username"] for user in users]
+        assert user.username in usernames and other_user.username not in usernames
+
+def test_latest_posts_author_outputs(user_scenario, monkeypatch):
+    """
+    Tests that author outputs are built once per author rather than once per article.
+    """
+    db = get_session()
+    authors = [create_random_editor(db) for _ in range(3)]
+    for i in range(12):
+        article = create_random_article_post(db, "/", -i)
+        ArticleCrud.update_article(db, ArticleCrud.get_article_by_path(db, article.category_path, article.filename), ArticleUpdate(
+            authors=[authors[i % len(authors)].username],
+        ))
+
+    author_ids = set(author.id for author in authors)
+    built_user_ids = []
+    build_user_output = UserCrud.build_user_output
+    monkeypatch.setattr(UserCrud, "build_user_output", lambda user: built_user_ids.append(user.id) or build_user_output(user))
+    monkeypatch.setattr(UserCrud, "USER_OUTPUT_CACHE_TTL", None) # Keep outputs cached regardless of how long the test takes
+    UserCrud._user_outputs.clear() # Creating the articles cached the outputs already
+
+    # Expect each author to be built once, then served from the cache on following requests
+    # Only this test's authors are checked, as the page may include articles from elsewhere
+    for first_request in [True, False]:
+        built_user_ids.clear()
+        response = client.get("/search/articles/latest", params={"limit": 12})
+        assert is_ok_response(response)
+        articles_output = ArticleLatestPosts.model_validate(response.json())
+        page_author_ids = set(author.id for article in articles_output.results for author in article.authors) & author_ids
+        assert len(page_author_ids) > 0
+        assert sorted(user_id for user_id in built_user_ids if user_id in author_ids) == (sorted(page_author_ids) if first_request else [])
+
+    # Expect changing an author to only rebuild their output
+    UserCrud.update_user(db, UserCrud.get_by_id(db, authors[0].id), UserUpdate(display_name=random_lower_string()))
+    built_user_ids.clear()
+    response = client.get("/search/articles/latest", params={"limit": 12})
+    assert is_ok_response(response)
+    assert [user_id for user_id in built_user_ids if user_id in author_ids] == ([authors[0].id] if authors[0].id in page_author_ids else [])
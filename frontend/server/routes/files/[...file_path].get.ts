@@ -4,35 +4,40 @@
 import { AxiosError } from "axios";
 import { useFileService } from "~/composables/Services";
 
-/** Maps extensions to their common HTTP application type equivalent suffix. */
-const EXTENSION_ALIASES: {[key: string]: string} = {
-  jpg: 'jpeg'
-}
+/** Request headers forwarded to the backend, for conditional and range requests. */
+const FORWARDED_REQUEST_HEADERS = ['range', 'if-range', 'if-none-match', 'if-modified-since']
+/** Response headers propagated from the backend. */
+const FORWARDED_RESPONSE_HEADERS = ['content-type', 'content-length', 'content-range', 'accept-ranges', 'etag', 'last-modified', 'cache-control']
 
 export default defineEventHandler(async (event) => {
   const fileService = useFileService()
   const path = event.context.params!.file_path
 
-  // Fetch file and decode response
+  // Stream the file's content
   try {
-    const file = await fileService.getFileMetadata('/' + path)
+    const requestHeaders: Record<string, string> = {}
+    for (const header of FORWARDED_REQUEST_HEADERS) {
+      const value = getRequestHeader(event, header)
+      if (value) {
+        requestHeaders[header] = value
+      }
+    }
+    const response = await fileService.getFileContent('/' + path, getQuery(event), requestHeaders)
 
-    // Read extension and convert to a common HTTP application type ID
-    let extension = file.filename.split('.')[1]
-    extension = EXTENSION_ALIASES[extension] || extension
+    // Propagate status and headers
+    setResponseStatus(event, response.status)
+    for (const header of FORWARDED_RESPONSE_HEADERS) {
+      const value = response.headers[header]
+      if (value !== undefined) {
+        setResponseHeader(event, header, value)
+      }
+    }
 
-    // Decode response
-    const decodedContent = Buffer.from(file.content, 'base64')
-    
-    // Set headers
-    setResponseHeader(event, 'Content-Type', 'image/' + extension) // TODO detect non-images
-    setResponseHeader(event, 'Content-Length', decodedContent.length)
-
-    return decodedContent;
+    return sendStream(event, response.data);
   } catch (e: any) {
     // Propagate backend response
     const err = e as AxiosError
     setResponseStatus(event, err.status, err.message)
     return
   }
-});
\ No newline at end of file
+});
@@ -23,6 +23,8 @@ export type ArticlePreview = {
   category_sorting_index: integer,
   authors: User[],
   summary: string,
+  /** Estimated minutes to read the published content */
+  reading_time: integer,
   tags: string[],
   can_comment: boolean,
   comments_count: integer,
@@ -79,7 +81,7 @@ export type ArticleUpdateRequest = {
   authors?: string[],
   category_path?: string,
   summary?: string,
-  /** Plaintext transcript of the article */
+  /** Plaintext transcript of the article; deprecated, as the backend extracts it from content */
   text?: string,
   tags?: string[],
   is_draft?: boolean,
@@ -23,6 +23,8 @@ export type Category = CategoryPreview & {
   articles: ArticlePreview[],
   /** Total amount of articles regardless of pagination limits applied to the articles field. */
   total_articles: integer,
+  /** Cursor for fetching the next page of articles; null if there are no more or they are not paginated. */
+  articles_next_cursor: string | null,
   subcategories: Category[],
 }
 
@@ -55,10 +57,11 @@ class CategoryService extends Service {
   }
 
   /** Fetches a category by its path; expects a leading slash. */
-  async getCategory(path: string, published_only?: boolean, limit?: integer, skip?: integer): Promise<Category> {
+  async getCategory(path: string, published_only?: boolean, limit?: integer, skip?: integer, cursor?: string): Promise<Category> {
     const response = await this.get('/categories' + path, {
       articles_amount: limit,
       articles_skip: skip,
+      articles_cursor: cursor,
       published_only: published_only,
     })
     return response.data
@@ -1,6 +1,8 @@
 /**
  * Utility methods for /files/ API routes.
  */
+import type { AxiosResponse } from 'axios'
+import type { Readable } from 'stream'
 import Service from './service'
 import type { User } from './user'
 
@@ -9,7 +11,6 @@ import type { User } from './user'
 export type SiteFileData = {
   path: string,
   filename: string,
-  content: base64String,
 }
 
 export type SiteFileCreationRequest = {
@@ -22,7 +23,10 @@ export type SiteFilePreview = SiteFileData & {
 }
 
 export type SiteFile = SiteFilePreview & {
-  content: base64String,
+  size: integer,
+  content_hash: string,
+  mime_type: string,
+  url: string, // API route of the file's content
 }
 
 export type SiteFileTree = {
@@ -60,9 +64,14 @@ class FileService extends Service {
     return response.data
   }
 
-  /** Returns the contents of a file. */
-  async getFileContent(path: path): Promise<any> {
-    const response = await this.get('/files' + path)
+  /**
+   * Returns a stream of the contents of a file. Images can be resized through the w, h and format params.
+   * Headers are forwarded to the backend, ex. for conditional and range requests, and responses are returned regardless of their status.
+   * Server-side only.
+   */
+  async getFileContent(path: path, params?: object, headers?: Record<string, string>): Promise<AxiosResponse<Readable>> {
+    const config = this.getConfig()
+    const response = await this.axios.get('/files' + path, {...config, headers: {...config.headers, ...headers}, params: params, responseType: 'stream', validateStatus: () => true})
     return response
   }
   
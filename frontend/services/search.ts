@@ -10,6 +10,8 @@ export type ArticleSearchResults = {
 
 export type ArticleLatestPosts = ArticleSearchResults & {
   total_articles: integer,
+  /** Cursor for fetching the next page; null if there are no more articles. */
+  next_cursor: string | null,
 }
 
 type SearchQuery = {
@@ -32,11 +34,12 @@ class SearchService extends Service {
     return response.data
   }
   
-  /** Fetches the latest published articles on the site. */
-  async getLatestArticles(limit: integer, skip: integer): Promise<ArticleLatestPosts> {
+  /** Fetches the latest published articles on the site. Pages after the first are fetched more efficiently with the previous page's cursor than by skipping. */
+  async getLatestArticles(limit: integer, skip: integer, cursor?: string): Promise<ArticleLatestPosts> {
     const response = await this.get('/search/articles/latest', {
       limit: limit,
       skip: skip,
+      cursor: cursor,
     })
     return response.data
   }
@@ -9,6 +9,14 @@ export const CMSUtils = {
     return '/files' + path
   },
 
+  /** Resolves the path of an image to a resized version of it that fits within the dimensions. */
+  resolveImagePath(path: path, width?: integer, height?: integer, format: string = 'webp') {
+    const params = new URLSearchParams({format: format})
+    if (width) params.set('w', width.toString())
+    if (height) params.set('h', height.toString())
+    return this.resolveFilePath(path) + '?' + params.toString()
+  },
+
   /** Resolves an article path to its frontend route. */
   resolveArticlePath(path: path) {
     return '/articles' + path